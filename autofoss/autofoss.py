@@ -33,11 +33,132 @@ import scale
 import gator
 import power
 import refill
-from csv_util import write_csv
+from csv_util import write_csv, bytes_to_mb, StreamingCSVWriter
+from npz_util import write_npz
+from export import ExportWorker
 import argparse
+import asyncio
+import numpy as np
+import datetime
+import time
 import traceback
 from component import ComponentManager
 
+def report_memory(samples):
+    print(f'Drain held {len(samples)} samples in {bytes_to_mb(samples.nbytes)} MB ({samples.bytes_per_sample():.1f} bytes/sample).')
+
+def print_window(result: dict):
+    # one line every ~10 seconds is plenty for the console
+    if result['window'] % 50 == 0:
+        peak = np.abs(result['H_avg']).max(axis=-1)
+        print(f"[realtime] window {result['window']}: weight {result['weight']:.2f} lbs, largest |H| so far {peak[~np.eye(len(peak), dtype=bool)].max():.2f}, {result['cpu_time'] * 1000:.1f} ms CPU")
+
+def start_recording(components: ComponentManager, args):
+    gator = components.get('gator')
+    if args.stream:
+        gator.writer = StreamingCSVWriter(out_folder=args.out_dir, max_bytes=int(args.rotate_size * 1024 * 1024)).start()
+    if args.realtime_frf:
+        if gator.estimator is None:
+            from realtime import StreamingFRFEstimator # imported only when asked for, so plain drains need nothing beyond numpy
+            gator.estimator = StreamingFRFEstimator(gator.sample_rate)
+            gator.estimator.subscribe(print_window)
+        gator.estimator.start(components.get('scale').weights)
+
+def stop_realtime(gator):
+    if gator.estimator is not None:
+        gator.estimator.stop()
+        print(f'Real-time FRFs: {gator.estimator.cpu_summary()}')
+
+def save_drain(samples, args, metadata: dict, date_time: str, prompt_on_error: bool=True) -> str:
+    if args.format == 'npz':
+        return write_npz(samples, out_folder=args.out_dir, fmt=f'autofoss_{date_time}.npz', metadata=metadata, compress=args.compress, prompt_on_error=prompt_on_error)
+    return write_csv(samples, out_folder=args.out_dir, fmt=f'autofoss_{date_time}.csv', prompt_on_error=prompt_on_error)
+
+def finish_recording(components: ComponentManager, args, exporter: ExportWorker=None):
+    gator = components.get('gator')
+    stop_realtime(gator)
+    if gator.writer is not None:
+        print('Everything is off. Flushing streamed samples...')
+        writer, gator.writer = gator.writer, None
+        file_names = writer.close()
+        if writer.error:
+            print(f'WARNING: streaming stopped early because of a write error - only {writer.rows} samples were saved.')
+        print(f'CSV file(s) written: {", ".join(file_names)}')
+        return
+    samples = gator.samples
+    report_memory(samples)
+    scale = components.get('scale')
+    metadata = {
+        'sample_rate': gator.sample_rate,
+        'full_tank_weight': scale.full_weight,
+        'scale_port': scale.ser.port,
+    }
+    # name the file after when the drain finished, not when it gets written
+    date_time = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
+    if exporter is not None:
+        # the scale keeps recording into its series during the refill, so the exported drain gets its own copy,
+        # and the Gator records the next drain into a fresh store
+        if samples.weights is not None:
+            samples.weights = samples.weights.copy()
+        gator.reset()
+        # earlier drains that couldn't be written are retried here, where it's safe to ask the user to free up space
+        exporter.retry_failed()
+        print(f'Everything is off. Saving drain in the background ({args.format.upper()})...')
+        exporter.submit(f'drain {date_time}', save_drain, samples, args, metadata, date_time, prompt_on_error=False)
+        return
+    print(f'Everything is off. Writing samples to {args.format.upper()}...')
+    file_name = save_drain(samples, args, metadata, date_time)
+    print(f'{args.format.upper()} file written: {file_name}')
+
+def close_exporter(exporter: ExportWorker):
+    if exporter is None:
+        return
+    exporter.close()
+    try:
+        exporter.retry_failed()
+    except KeyboardInterrupt:
+        pass
+    if exporter.failed:
+        print(f'WARNING: {len(exporter.failed)} drain(s) could not be saved: {", ".join(name for name, *_ in exporter.failed)}')
+
+# region Lifecycle
+def start_components(components: ComponentManager, args, *names):
+    if args.use_async:
+        asyncio.run(components.astart(*names))
+    else:
+        components.start(*names)
+
+def stop_components(components: ComponentManager, args, *names):
+    if args.use_async:
+        asyncio.run(components.astop(*names))
+    else:
+        components.stop(*names)
+
+class CycleTimer:
+    """Logs how long each phase of a drain cycle took, and the turnaround from the end of one drain to the start of the next."""
+    def __init__(self):
+        self.started = time.monotonic()
+        self.last = self.started
+        self.drain_ended = None
+        self.drains = 0
+
+    def lap(self, phase: str):
+        now = time.monotonic()
+        print(f'[timing] {phase} took {now - self.last:.1f}s')
+        self.last = now
+
+    def drain_started(self):
+        self.lap('Startup')
+        if self.drain_ended is not None:
+            print(f'[timing] Turnaround since the last drain ended: {self.last - self.drain_ended:.1f}s')
+
+    def drain_finished(self):
+        self.lap('Drain')
+        self.drain_ended = self.last
+        self.drains += 1
+        hours = (self.last - self.started) / 3600
+        print(f'[timing] {self.drains} drain(s) so far, {self.drains / hours:.1f} drains/hour')
+
 # region Refill
 def do_refill(components: ComponentManager):
     print('Refilling tank...')
@@ -70,17 +191,22 @@ def do_nodrain(args) -> int:
                     priority=3)
     components.add('scale', \
                     scale.AutofossScale(components, log_scale=not args.no_log_scale, default_port=args.scale_port, weight_timeout=args.weight_timeout, full_weight=args.full_tank_weight), \
-                    priority=2)
+                    priority=2, requires=('gator',))
     components.add('gator', \
                     gator.AutofossGator(components, auto_end=True, log_gator=args.log_gator, nodrain=True), \
-                    priority=1)
-    components.start_all()
+                    priority=1, requires=('power',))
+    start_recording(components, args)
+    if args.use_async:
+        asyncio.run(components.astart_all())
+    else:
+        components.start_all()
     components.get('scale').wait_for_thread()
     print("Shutting down...")
-    components.stop_all()
-    print('Everything is off. Writing samples to CSV...')
-    file_name = write_csv(components.get('gator').samples, out_folder=args.out_dir)
-    print(f'CSV file written: {file_name}')
+    if args.use_async:
+        asyncio.run(components.astop_all())
+    else:
+        components.stop_all()
+    finish_recording(components, args)
     return 0
 
 # region Main 
@@ -110,7 +236,16 @@ Procedure for use:
     parser.add_argument("-o", "--out-dir", help="Output directory for CSV files", default="drains")
     parser.add_argument("--no-drain", help="Don't drain the tank, just take a continuous data sample", action="store_true")
     parser.add_argument("--full-tank-weight", help="Weight of the tank when full in lbs", type=float, default=15.45)
+    parser.add_argument("--stream", help="Stream samples to CSV while the drain is running instead of writing them all at the end", action="store_true")
+    parser.add_argument("--rotate-size", help="When streaming, start a new CSV file once the current one reaches this size in MB", type=float, default=1024)
+    parser.add_argument("--format", help="Output format for drains - npz is a binary columnar format that's much smaller and faster to load", choices=["csv", "npz"], default="csv")
+    parser.add_argument("--compress", help="Compress npz output (smaller, but can't be memory-mapped when loading)", action="store_true")
+    parser.add_argument("--export-queue", help="How many finished drains can wait to be saved in the background while the next refill and drain run (0 saves each drain before refilling)", type=int, default=1)
+    parser.add_argument("--realtime-frf", help="Compute transfer functions between the tracks every 0.2 s window while the drain is running", action="store_true")
+    parser.add_argument("--async", dest="use_async", help="Start and stop components that don't depend on each other concurrently, instead of one after another", action="store_true")
     args = parser.parse_args()
+    if args.stream and args.format != "csv":
+        parser.error("--stream is only supported with --format csv")
     
     # region Immediate arguments
     if args.no_drain:
@@ -123,7 +258,7 @@ Procedure for use:
                         priority=3)
         components.add('scale', \
                         scale.AutofossScale(components, log_scale=not args.no_log_scale, default_port=args.scale_port, weight_timeout=args.weight_timeout, full_weight=args.full_tank_weight), \
-                        priority=2)
+                        priority=2, requires=('gator',))
         components.add('gator', \
                         gator.AutofossGator(components, auto_end=True, log_gator=args.log_gator), \
                         priority=1)
@@ -150,10 +285,10 @@ Procedure for use:
                     priority=3)
     components.add('scale', \
                     scale.AutofossScale(components, log_scale=not args.no_log_scale, default_port=args.scale_port, weight_timeout=args.weight_timeout, full_weight=args.full_tank_weight), \
-                    priority=2)
+                    priority=2, requires=('gator',))
     components.add('gator', \
                     gator.AutofossGator(components, auto_end=True, log_gator=args.log_gator), \
-                    priority=1)
+                    priority=1, requires=('power',))
     components.add('refill', \
                     refill.AutofossRefiller(components, threshold=args.bucket_weight, extra=args.pump_extra_runtime), \
                     priority=-1)
@@ -162,36 +297,46 @@ Procedure for use:
     running = True
     force_shutdown = False
     jump_refill = args.refill_first
-    while running:
-        components.start('power')
-
-        if jump_refill:
-            do_refill(components)
-            jump_refill = False
-            continue
+    timer = CycleTimer()
+    exporter = ExportWorker(max_pending=args.export_queue).start() if args.export_queue > 0 else None
+    # make sure every drain that's been handed to the exporter is saved, however the loop ends
+    try:
+        while running:
+            if jump_refill:
+                components.start('power')
+                do_refill(components)
+                jump_refill = False
+                continue
 
-        components.start('gator', 'scale')
+            start_recording(components, args)
+            # the power supply reconnects every cycle; in async mode the scale only comes up once the Gator is streaming,
+            # since its 10 s disconnect check starts counting when its thread does
+            start_components(components, args, 'power', 'gator', 'scale')
+            timer.drain_started()
 
-        stop_next, force_shutdown = components.get('scale').wait_for_thread()
+            stop_next, force_shutdown = components.get('scale').wait_for_thread()
+            timer.drain_finished()
 
-        print("Shutting down...")
-        components.stop('gator', 'scale')
-        if force_shutdown:
-            components.stop('power')     
-        print('Everything is off. Writing samples to CSV...')
-        file_name = write_csv(components.get('gator').samples, out_folder=args.out_dir)
-        print(f'CSV file written: {file_name}')
-        if force_shutdown:
-            return 128 # SIGINT
+            print("Shutting down...")
+            stop_components(components, args, 'gator', 'scale')
+            if force_shutdown:
+                components.stop('power')     
+            finish_recording(components, args, exporter)
+            timer.lap('Shutdown and save' if exporter is None else 'Shutdown')
+            if force_shutdown:
+                return 128 # SIGINT
 
-        if stop_next:
-            print('Gracefully stopping.')
-            for component in components.values():
-                component.stop()
-            return 0
+            if stop_next:
+                print('Gracefully stopping.')
+                for component in components.values():
+                    component.stop()
+                return 0
 
-        do_refill(components)
-        print('And now, again!')
+            do_refill(components)
+            timer.lap('Refill')
+            print('And now, again!')
+    finally:
+        close_exporter(exporter)
     return 0
 
 # region Entry
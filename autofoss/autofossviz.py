@@ -6,10 +6,10 @@ from tkinter import filedialog
 import threading
 import plotters
 
-def pick_file(type="csv"):
+def pick_file(types=("csv", "npz")):
     root = tk.Tk()
     root.withdraw()
-    file_path = filedialog.askopenfilename(filetypes=[(f"{type.upper()} files", f"*.{type}")])
+    file_path = filedialog.askopenfilename(filetypes=[("Drain recordings", " ".join(f"*.{type}" for type in types))] + [(f"{type.upper()} files", f"*.{type}") for type in types])
     return file_path
 
 loadbox_window = None
@@ -36,9 +36,9 @@ def main() -> int:
     if not file_path:
         print("No file selected.")
         return 1
-    open_loadbox("Loading CSV...")
-    df = pd.read_csv(file_path)
-    print(df)
+    open_loadbox("Opening drain...")
+    drain = plotters.open_drain(file_path) # columns are only read once a plot asks for them
+    print(drain)
     close_loadbox()
     
     while True:
@@ -59,7 +59,7 @@ def main() -> int:
         prompt_window.mainloop()
         prompt_window.destroy()
         
-        plotter = selected_plotter(df)
+        plotter = selected_plotter(drain, file_path)
         plotter.plot()
         plotter.show()
 
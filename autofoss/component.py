@@ -1,4 +1,6 @@
 import time
+import asyncio
+import threading
 
 class AutofossComponent:
     def __init__(self, manager: 'ComponentManager'): # passing other components to allow for inter-component communication
@@ -23,10 +25,18 @@ class ComponentManager:
     def __init__(self):
         self.components = {}
         self.prior = {}
+        self.requires = {}
+        self.condition = threading.Condition()
+        self.signalled = set()
     
-    def add(self, name: str, component: AutofossComponent, priority: int=0):
+    def add(self, name: str, component: AutofossComponent, priority: int=0, requires: tuple=()):
+        """
+        `priority` orders the sequential start_all/stop_all. `requires` lists the components that have to be started before
+        this one (and stopped after it) - the async lifecycle uses it to start everything else concurrently.
+        """
         self.components[name] = component
         self.prior[name] = priority
+        self.requires[name] = tuple(requires)
         
     def start_all(self):
         for name in sorted(self.components.keys(), key=lambda x: self.prior[x]):
@@ -59,6 +69,82 @@ class ComponentManager:
     def get(self, name):
         return self.components[name]
 
+    # region Async lifecycle
+    # Component methods are all blocking device I/O, so each one runs in the default executor and the event loop just
+    # orders them: a component waits only on its `requires`, everything else happens at the same time.
+    async def _call(self, name: str, method: str):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, getattr(self.components[name], method))
+
+    async def _run_ordered(self, names, method: str, reverse: bool=False):
+        tasks = {}
+        async def run(name):
+            if reverse: # stop dependents before the components they depend on
+                deps = [tasks[other] for other in tasks if name in self.requires[other]]
+            else:
+                deps = [tasks[dep] for dep in self.requires[name] if dep in tasks]
+            await asyncio.gather(*deps)
+            await self._call(name, method)
+        for name in names:
+            tasks[name] = asyncio.ensure_future(run(name))
+        await asyncio.gather(*tasks.values())
+
+    async def astart(self, *names):
+        await self._run_ordered(names, 'start')
+
+    async def astop(self, *names):
+        await self._run_ordered(names, 'stop', reverse=True)
+
+    async def apause(self, *names):
+        await asyncio.gather(*(self._call(name, 'pause') for name in names))
+
+    async def aresume(self, *names):
+        await asyncio.gather(*(self._call(name, 'resume') for name in names))
+
+    async def astart_all(self):
+        await self.astart(*[name for name in self.components if self.prior[name] >= 0])
+
+    async def astop_all(self):
+        await self.astop(*[name for name in self.components if self.prior[name] >= 0])
+
+    async def apause_all(self):
+        await self.apause(*self.components)
+
+    async def aresume_all(self):
+        await self.aresume(*self.components)
+
+    # region Events
+    # Components signal named events ('drain_finished', 'refilled', ...) and the main loop waits on them,
+    # instead of anyone spinning on a flag.
+    def signal(self, name: str):
+        with self.condition:
+            self.signalled.add(name)
+            self.condition.notify_all()
+
+    def clear(self, *names):
+        with self.condition:
+            self.signalled.difference_update(names)
+
+    def is_set(self, name: str) -> bool:
+        with self.condition:
+            return name in self.signalled
+
+    def wait_for(self, *names, timeout=None) -> set:
+        """
+        Blocks until any of the named events has been signalled (or `timeout` seconds pass), and returns the ones that were.
+        Waits in short slices so CTRL+C still gets through on every platform.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.condition:
+            while True:
+                fired = self.signalled.intersection(names)
+                if fired:
+                    return fired
+                remaining = 0.25 if deadline is None else min(0.25, deadline - time.monotonic())
+                if remaining <= 0:
+                    return set()
+                self.condition.wait(remaining)
+
     def request_human(self, msg):
         print("Intervention request raised.")
         self.pause_all()
@@ -0,0 +1,80 @@
+"""
+Array conversions for FOSS data: Gator CoG values -> wavelengths (nm) -> microstrain.
+
+Everything takes whole arrays (rows of samples, one column per sensor) and broadcasts per-sensor calibration values
+along the last axis. `dtype` picks the output precision (float64 or float32); the old tools reach this module through
+old/common/cog.py.
+
+The CoG -> wavelength mapping is affine with an exact power-of-two slope (72 nm / 2^18), so plain arithmetic gives the
+correctly rounded wavelength in both precisions - exactly what the scalar cog_to_wavelength gives - and it's faster than
+looking the value up in a 2^18-entry table (tests/test-conversions.py measures both).
+"""
+import numpy as np
+
+COG_BITS = 18
+COG_RANGE = 1 << COG_BITS
+WAVELENGTH_MIN = 1514 # nm at CoG 0
+WAVELENGTH_SPAN = 1586 - 1514 # nm over the whole CoG range
+STRAIN_FACTOR = 1 - 0.22 # 0.78, i.e. 1 - the fibre's photo-elastic coefficient
+GATOR_API_UNITS = 100000 # gator_api reports wavelengths in 1e-5 nm
+NUM_SENSORS = 8
+
+# sensor k's 19 bits (18 CoG bits, then its error bit) start at bit 19*k of a packet's 24 CoG data bytes, so they always
+# lie within the 4 bytes starting at byte (19*k)//8 - _cog_bytes picks those, _cog_shift drops the bits after them
+_cog_bytes = np.array([(19 * k) // 8 for k in range(NUM_SENSORS)])[:, None] + np.arange(4)
+_cog_shift = np.array([32 - (19 * k) % 8 - 19 for k in range(NUM_SENSORS)], dtype=np.uint32)
+
+def unpack_cog(cog_data) -> tuple:
+    """
+    CoG values and error bits from packed CoG data: the 24 bytes after the status word of each Gator packet, as an (N, 24)
+    uint8 array or N*24 bytes. Returns ((N, 8) uint32 CoG values, (N, 8) uint8 error bits).
+    """
+    if not isinstance(cog_data, np.ndarray):
+        cog_data = np.frombuffer(cog_data, dtype=np.uint8).reshape(-1, 24)
+    packed = cog_data[:, _cog_bytes].astype(np.uint32)
+    words = (packed[..., 0] << 24) | (packed[..., 1] << 16) | (packed[..., 2] << 8) | packed[..., 3]
+    words >>= _cog_shift
+    return (words >> 1) & (COG_RANGE - 1), (words & 1).astype(np.uint8)
+
+def cog_from_strings(strings) -> np.ndarray:
+    """CoG values from 18-character bit strings (as in fossfetch CSVs), like int(s, 2) on each one."""
+    strings = np.asarray(strings, dtype=str)
+    raw = np.char.encode(strings.ravel(), 'ascii') if strings.size else np.zeros(0, dtype='S1')
+    bits = raw.view(np.uint8).reshape(len(raw), -1) if raw.dtype.itemsize == COG_BITS else None
+    if bits is not None and np.all((bits == ord('0')) | (bits == ord('1'))):
+        values = (bits - ord('0')).astype(np.int64) @ (1 << np.arange(COG_BITS - 1, -1, -1, dtype=np.int64))
+    else:
+        # other lengths, prefixes, whitespace... - int() decides, and raises ValueError for anything that isn't binary
+        values = np.array([int(s, 2) for s in strings.ravel()], dtype=np.int64)
+    return values.reshape(strings.shape)
+
+def cog_to_wavelength(cog, dtype=np.float64) -> np.ndarray:
+    """Wavelengths in nm from integer CoG values."""
+    cog = np.asarray(cog)
+    return cog.astype(dtype) * dtype(WAVELENGTH_SPAN / COG_RANGE) + dtype(WAVELENGTH_MIN)
+
+def api_to_wavelength(values, dtype=np.float64) -> np.ndarray:
+    """Wavelengths in nm from gator_api sample values."""
+    return np.asarray(values, dtype=dtype) / dtype(GATOR_API_UNITS)
+
+def wavelength_to_microstrain(wavelengths, baseline=None, strain_factor=STRAIN_FACTOR, dtype=None):
+    """
+    Microstrain relative to `baseline` (one wavelength per sensor; the first row if not given). `strain_factor` can also be
+    given per sensor. Works on pandas objects too, as long as `baseline` is given; `dtype` None keeps the input's.
+    """
+    if baseline is None:
+        baseline = wavelengths[0]
+    microstrain = (wavelengths - baseline) / baseline * (1 / np.asarray(strain_factor)) * 1e6
+    return microstrain if dtype is None else microstrain.astype(dtype, copy=False)
+
+def cog_to_microstrain(cog, baseline_cog=None, strain_factor=STRAIN_FACTOR, dtype=np.float64) -> np.ndarray:
+    """
+    Microstrain straight from integer CoG values, relative to `baseline_cog` (one per sensor; the first row if not given).
+    The wavelength shift is taken from the integer CoG difference, so it's exact even in float32.
+    """
+    cog = np.asarray(cog)
+    if baseline_cog is None:
+        baseline_cog = cog[0]
+    baseline_cog = np.asarray(baseline_cog)
+    scale = WAVELENGTH_SPAN / COG_RANGE / cog_to_wavelength(baseline_cog) * (1 / np.asarray(strain_factor)) * 1e6
+    return (cog.astype(np.int64) - baseline_cog).astype(dtype) * np.asarray(scale, dtype=dtype)
@@ -3,19 +3,31 @@ import csv
 from tqdm import tqdm
 import os
 import traceback
+import threading
+import queue
+from itertools import islice
+import numpy as np
+from samplestore import SampleStore, SAMPLE_COLUMNS, ns_to_isoformat_array
 
 def bytes_to_gb(size: int) -> float:
     return round(size / 1024 / 1024 / 1024, ndigits=2)
 
-def write_csv(samples: dict, out_folder=".", fmt="autofoss_%datetime%.csv") -> str:
+def bytes_to_mb(size: int) -> float:
+    return round(size / 1024 / 1024, ndigits=2)
+
+def write_csv(samples: SampleStore, out_folder=".", fmt="autofoss_%datetime%.csv", prompt_on_error=True) -> str:
+    """
+    Writes a drain to CSV. If the disk fills up, asks for ENTER and tries again - or with `prompt_on_error=False` (used from
+    the background exporter, which mustn't read stdin) raises the IOError instead.
+    """
     os.makedirs(out_folder, exist_ok=True)
-    sample_columns = ['Timestamp', 'Elapsed', 'Current Weight',
-                    'Sensor 1', 'Sensor 2', 'Sensor 3', 'Sensor 4',
-                    'Sensor 5', 'Sensor 6', 'Sensor 7', 'Sensor 8']
+    sample_columns = SAMPLE_COLUMNS
     date_time = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
     file_name = os.path.join(out_folder, fmt.replace('%datetime%', date_time))
-    # estimate storage requirement from the first sample
-    csv_size = bytes_to_gb(sum([len(str(sample[col])) for col in sample_columns for sample in samples]))
+    # estimate storage requirement from the first few samples instead of walking the whole drain twice
+    head = list(islice(samples, 1000))
+    row_size = sum(len(str(sample[col])) + 1 for col in sample_columns for sample in head) / max(len(head), 1)
+    csv_size = bytes_to_gb(int(row_size * len(samples)))
     print(f"Estimated CSV file size: {csv_size} GB")
     try:
         with open(file=file_name, mode='w', encoding='utf-8', newline='') as csv_file:
@@ -25,8 +37,88 @@ def write_csv(samples: dict, out_folder=".", fmt="autofoss_%datetime%.csv") -> s
                 csv_writer.writerow(sample)
     # if the user runs out of disk space...
     except IOError:
+        if not prompt_on_error:
+            raise
         traceback.print_exc()
         print("Error: could not write to file. Make sure you have enough disk space. Don't worry - your drain is still in memory - just free up enough space and press ENTER to try again.")
         input("Press ENTER to try again...")
-        return write_csv(samples, out_folder=out_folder)
-    return file_name
\ No newline at end of file
+        return write_csv(samples, out_folder=out_folder, fmt=fmt)
+    return file_name
+
+def format_rows(timestamps_ns, elapsed, weight, sensors) -> str:
+    """Formats a chunk of samples as CSV text, with the same float formatting csv.DictWriter uses."""
+    timestamps = ns_to_isoformat_array(timestamps_ns)
+    weight = np.broadcast_to(weight, np.shape(elapsed))
+    values = np.column_stack((elapsed, weight, sensors)).tolist()
+    row_fmt = '%s,' + ','.join(['%r'] * (2 + np.shape(sensors)[1])) + '\r\n'
+    return ''.join([row_fmt % (ts, *row) for ts, row in zip(timestamps, values)])
+
+class StreamingCSVWriter:
+    """
+    Writes samples to CSV from a background thread while the drain is still running.
+
+    Chunks are handed over through a bounded queue with `write()` (which blocks if the disk can't keep up, rather than letting
+    memory grow without bound), appended to the current file, and a new file is started whenever the current one grows past
+    `max_bytes`. `close()` only has to flush whatever is still queued, so stopping is almost instant.
+    """
+    def __init__(self, out_folder=".", fmt="autofoss_%datetime%.csv", max_bytes=1024**3, queue_size=1024):
+        self.out_folder = out_folder
+        self.fmt = fmt
+        self.max_bytes = max_bytes
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.files = []
+        self.rows = 0
+        self.error = None
+        self.t = None
+        self._file = None
+        self._file_bytes = 0
+        self._date_time = None
+
+    def start(self) -> 'StreamingCSVWriter':
+        os.makedirs(self.out_folder, exist_ok=True)
+        self._date_time = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
+        self.t = threading.Thread(target=self.thread, daemon=True)
+        self.t.start()
+        return self
+
+    def write(self, timestamps_ns, elapsed, weight, sensors):
+        self.queue.put((timestamps_ns, elapsed, weight, sensors))
+
+    def close(self) -> list:
+        """Flushes everything still queued, closes the last file and returns the names of all files written."""
+        self.queue.put(None)
+        self.t.join()
+        return self.files
+
+    def _next_file(self):
+        if self._file:
+            self._file.close()
+        name = self.fmt.replace('%datetime%', self._date_time)
+        if self.files:
+            root, ext = os.path.splitext(name)
+            name = f"{root}_part{len(self.files) + 1}{ext}"
+        file_name = os.path.join(self.out_folder, name)
+        self._file = open(file=file_name, mode='w', encoding='utf-8', newline='')
+        self._file_bytes = self._file.write(','.join(SAMPLE_COLUMNS) + '\r\n')
+        self.files.append(file_name)
+
+    def thread(self):
+        while True:
+            chunk = self.queue.get()
+            if chunk is None:
+                break
+            if self.error:
+                continue # keep draining the queue so acquisition never blocks on a dead writer
+            try:
+                if self._file is None or self._file_bytes >= self.max_bytes:
+                    self._next_file()
+                self._file_bytes += self._file.write(format_rows(*chunk))
+                self.rows += len(chunk[0])
+            # if the user runs out of disk space...
+            except IOError as e:
+                traceback.print_exc()
+                print("Error: could not write to file. Make sure you have enough disk space. Samples from this point on in the drain are being discarded.")
+                self.error = e
+        if self._file:
+            self._file.close()
+            self._file = None
\ No newline at end of file
@@ -0,0 +1,84 @@
+import queue
+import threading
+import time
+import traceback
+
+class ExportWorker:
+    """
+    Saves finished drains from a background thread, so the next refill (and drain) doesn't have to wait for the disk.
+
+    Each `submit()` hands over a callable that writes one drain. Jobs go through a bounded queue: once `max_pending` drains
+    are waiting, `submit()` blocks until one of them has been written, so unsaved drains can't pile up in memory.
+    `close()` waits for every submitted export to finish. The thread isn't a daemon, so even if the main loop dies the
+    interpreter still waits for the exports before exiting.
+
+    The thread never asks the user anything (the main thread may be waiting on stdin itself). An export that fails is
+    printed and kept, drain and all, in `failed`; `retry_failed()` retries those from the main thread.
+    """
+    def __init__(self, max_pending=1):
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.files = []
+        self.failed = []
+        self.lock = threading.Lock()
+        self.t = None
+
+    def start(self) -> 'ExportWorker':
+        self.t = threading.Thread(target=self.thread, name='export')
+        self.t.start()
+        return self
+
+    def submit(self, name: str, export, *args, **kwargs):
+        if self.queue.full():
+            print(f'Waiting for earlier drains to finish saving before queueing {name}...')
+        self.queue.put((name, export, args, kwargs))
+
+    def close(self) -> list:
+        """Waits for every queued export to finish and returns the names of the files written."""
+        if self.queue.unfinished_tasks:
+            print('Waiting for queued drains to finish saving...')
+        self.queue.put(None)
+        self.t.join()
+        return self.files
+
+    def retry_failed(self):
+        """
+        Saves the drains whose exports failed, on the calling thread: asks for ENTER (so the user can free up disk space
+        first) and retries, until every one of them has been written.
+        """
+        while True:
+            with self.lock:
+                jobs, self.failed = self.failed, []
+            if not jobs:
+                return
+            try:
+                input(f"{len(jobs)} drain(s) could not be saved ({', '.join(job[0] for job in jobs)}). Don't worry - they're still in memory - just free up enough space and press ENTER to try again...")
+                jobs = [job for job in jobs if not self._run(job)]
+            finally:
+                with self.lock:
+                    self.failed = jobs + self.failed
+
+    def _run(self, job) -> bool:
+        name, export, args, kwargs = job
+        started = time.monotonic()
+        try:
+            file_name = export(*args, **kwargs)
+        except Exception:
+            traceback.print_exc()
+            print(f'Error: could not save {name} - it\'s still in memory and will be retried.')
+            return False
+        self.files.append(file_name)
+        print(f'[timing] Saving {name} took {time.monotonic() - started:.1f}s - written to {file_name}')
+        return True
+
+    def thread(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                self.queue.task_done()
+                break
+            try:
+                if not self._run(job):
+                    with self.lock:
+                        self.failed.append(job)
+            finally:
+                self.queue.task_done()
@@ -3,28 +3,39 @@ from gator_api.gator_data import GatorData
 import logging
 from logging.handlers import RotatingFileHandler
 import datetime
+import time
+from itertools import chain
+from operator import itemgetter
+import numpy as np
 from component import AutofossComponent, ComponentManager
+from samplestore import SampleStore, SENSOR_COLUMNS
+from conversions import api_to_wavelength
+
+SAMPLE_RATE = 19320 # Hz, what the Gator streams at with the 19 kHz setting
+
+get_sensors = itemgetter(*SENSOR_COLUMNS)
 
 def to_nm(sample):
-    return sample/100000 # HACK: terrible conversion method but it works
+    return api_to_wavelength(sample)
+
+def convert_batch(data_array, received_ns: int, start_ns: int, sample_rate: float=SAMPLE_RATE):
+    """
+    Converts a whole callback batch into arrays in one go.
+
+    The batch shares a single wall-clock reading (`received_ns`, taken when the callback fired), which is assigned to the last
+    sample - earlier samples are spaced backwards from it by the sample period.
 
-def convert_sample(sample, current_weight, elapsed):
-    return {
-        "Timestamp": datetime.datetime.now().isoformat(),
-        "Elapsed": elapsed,
-        "Current Weight": current_weight,
-        "Sensor 1": to_nm(sample["Sensor 1"]),
-        "Sensor 2": to_nm(sample["Sensor 2"]),
-        "Sensor 3": to_nm(sample["Sensor 3"]),
-        "Sensor 4": to_nm(sample["Sensor 4"]),
-        "Sensor 5": to_nm(sample["Sensor 5"]),
-        "Sensor 6": to_nm(sample["Sensor 6"]),
-        "Sensor 7": to_nm(sample["Sensor 7"]),
-        "Sensor 8": to_nm(sample["Sensor 8"])
-    }
+    Returns (timestamps in epoch ns, elapsed seconds since `start_ns`, (n, 8) sensor wavelengths in nm).
+    """
+    n = len(data_array)
+    sensors = np.fromiter(chain.from_iterable(map(get_sensors, data_array)), dtype=np.float64, count=n * len(SENSOR_COLUMNS))
+    sensors = to_nm(sensors.reshape(n, len(SENSOR_COLUMNS)))
+    timestamps = received_ns - (np.arange(n - 1, -1, -1) * (1e9 / sample_rate)).astype(np.int64)
+    elapsed = (timestamps - start_ns) / 1e9
+    return timestamps, elapsed, sensors
 
 class AutofossGator(AutofossComponent):
-    def __init__(self, manager: ComponentManager, auto_end=True, log_gator=False, nodrain=False):
+    def __init__(self, manager: ComponentManager, auto_end=True, log_gator=False, nodrain=False, sample_rate=SAMPLE_RATE):
         self.logger = logging.getLogger(__name__)
         log_formatter = logging.Formatter('%(asctime)s %(levelname)s %(funcName)s:%(lineno)d %(message)s')
         handler = RotatingFileHandler('photonfirst-api.log',
@@ -47,12 +58,16 @@ class AutofossGator(AutofossComponent):
         self.power = manager.get('power')
         self.auto_end = auto_end
         self.log = log_gator
-        self.samples = []
+        self.samples = SampleStore()
+        self.writer = None # set to a StreamingCSVWriter to stream samples to disk instead of holding them in memory
+        self.estimator = None # set to a realtime.StreamingFRFEstimator to compute FRFs during the drain
         self.gator_data = GatorData(self.api, self.logger)
         self.gator_data.register_callback(self.on_sample_received)
         self.start_time = None
+        self.start_ns = None
         self.last_packet = None
         self.nodrain = nodrain
+        self.sample_rate = sample_rate
 
     def elapsed(self) -> float:
         if self.start_time is None:
@@ -65,19 +80,28 @@ class AutofossGator(AutofossComponent):
         return (datetime.datetime.now() - self.last_packet).total_seconds()
 
     def on_sample_received(self, data_array):
+        received_ns = time.time_ns()
         self.last_packet = datetime.datetime.now()
-        for sample in data_array:
-            if not self.scale.thread_initialized:
-                continue
-            self.samples.append(convert_sample(sample, self.scale.current_weight, self.elapsed()))
-            if self.log:
-                print(self.samples[-1]) # kills performance, but useful for debugging
+        if not self.scale.thread_initialized or len(data_array) == 0:
+            return
+        timestamps, elapsed, sensors = convert_batch(data_array, received_ns, self.start_ns, self.sample_rate)
+        if self.estimator is not None:
+            self.estimator.feed(timestamps, sensors)
+        if self.writer is not None:
+            self.writer.write(timestamps, elapsed, self.scale.weights.asof(timestamps), sensors)
+            return
+        self.samples.extend(timestamps, elapsed, sensors)
+        if self.log:
+            for i in range(len(self.samples) - len(data_array), len(self.samples)):
+                print(self.samples[i]) # kills performance, but useful for debugging
 
     def start(self):
         print("Enabling static...")
         self.power.on(1)
         print("Starting Gator...")
         self.start_time = datetime.datetime.now()
+        self.start_ns = time.time_ns()
+        self.samples.weights = self.scale.weights
         self.api.start_streaming(self.gator)
         self.gator_data.start_streaming()
         if not self.nodrain:
@@ -89,7 +113,7 @@ class AutofossGator(AutofossComponent):
         self.gator_data.stop_streaming()
     
     def reset(self):
-        self.samples = []
+        self.samples = SampleStore()
 
     def pause(self):
         self.api.stop_streaming(self.gator)
@@ -0,0 +1,159 @@
+"""
+Level-of-detail decimation for plotting long time series.
+
+Handing matplotlib tens of millions of points makes every pan and zoom redraw all of them. A `MinMaxPyramid` is built
+once per column: the position of the minimum and maximum of every bucket of BASE_BUCKET samples, then of every 2, 4, 8...
+of those buckets. For a view, it finds the samples that fall in each pixel column and returns the first, minimum, maximum
+and last of them (in time order) - the extrema come from at most two buckets per level plus a few raw samples, so this
+costs about the same at any zoom. That's all a line needs to light up the same pixels as the full data (give or take
+where a wide stroke spills over into the next column), at four points per pixel column. `LODLine` keeps a matplotlib line
+up to date as its axes are zoomed, panned or resized.
+"""
+import numpy as np
+
+BASE_BUCKET = 16 # samples per bucket at the finest level
+RAW_POINTS_PER_PIXEL = 4 # views with fewer samples than this per pixel column are plotted as they are
+
+class MinMaxPyramid:
+    def __init__(self, y, x=None, base_bucket: int=BASE_BUCKET):
+        """`y` is the column to plot, against `x` (sorted ascending; sample numbers if None)."""
+        self.y = np.asarray(y)
+        self.x = np.asarray(x) if x is not None else None
+        self.base_bucket = base_bucket
+        index_dtype = np.int32 if len(self.y) < 2**31 else np.int64
+        # levels[k] is (argmin, argmax) for buckets of base_bucket * 2^k samples, as indices into y
+        self.levels = []
+        n_full = len(self.y) // base_bucket * base_bucket
+        if n_full == 0:
+            return
+        offsets = np.arange(0, n_full, base_bucket, dtype=index_dtype)
+        buckets = self.y[:n_full].reshape(-1, base_bucket)
+        lo = offsets + buckets.argmin(axis=1).astype(index_dtype)
+        hi = offsets + buckets.argmax(axis=1).astype(index_dtype)
+        lo, hi = self._with_tail(lo, hi, n_full, len(self.y))
+        self.levels.append((lo, hi))
+        while len(lo) > 1:
+            lo, hi = self._coarsen(lo, hi)
+            self.levels.append((lo, hi))
+
+    def _with_tail(self, lo, hi, start: int, stop: int) -> tuple:
+        """Adds the last, partly filled bucket."""
+        if start == stop:
+            return lo, hi
+        tail = self.y[start:stop]
+        return np.append(lo, start + tail.argmin()).astype(lo.dtype), np.append(hi, start + tail.argmax()).astype(hi.dtype)
+
+    def _coarsen(self, lo, hi) -> tuple:
+        """Merges pairs of buckets."""
+        n = len(lo) // 2 * 2
+        a, b = lo[0:n:2], lo[1:n:2]
+        new_lo = np.where(self.y[b] < self.y[a], b, a)
+        a, b = hi[0:n:2], hi[1:n:2]
+        new_hi = np.where(self.y[b] > self.y[a], b, a)
+        if n < len(lo):
+            new_lo, new_hi = np.append(new_lo, lo[-1]), np.append(new_hi, hi[-1])
+        return new_lo, new_hi
+
+    def __len__(self) -> int:
+        return len(self.y)
+
+    def _x(self, idx):
+        return idx if self.x is None else self.x[idx]
+
+    def index_range(self, x0: float=None, x1: float=None) -> tuple:
+        """The samples [start, stop) from the one just before x0 to the one just after x1, so lines run off the edges."""
+        if self.x is None:
+            start = 0 if x0 is None else int(np.floor(x0))
+            stop = len(self) if x1 is None else int(np.ceil(x1)) + 1
+        else:
+            start = 0 if x0 is None else int(np.searchsorted(self.x, x0, side='right')) - 1
+            stop = len(self) if x1 is None else int(np.searchsorted(self.x, x1, side='left')) + 1
+        start, stop = max(start, 0), min(stop, len(self))
+        return start, max(start, stop)
+
+    def extrema(self, a, b) -> tuple:
+        """
+        (argmin, argmax) of y over each range [a[i], b[i]) - a and b are arrays, with every a < b. The ranges are covered
+        like a segment tree query: raw samples up to the first bucket boundary and after the last, and then at most two
+        buckets per level.
+        """
+        base = self.base_bucket
+        a, b = np.asarray(a, dtype=np.int64), np.asarray(b, dtype=np.int64)
+        lo, hi = a.copy(), a.copy()
+        l, r = -(-a // base), b // base
+        # the raw samples outside whole buckets, fewer than `base` at either end
+        head_end = np.minimum(l * base, b)
+        for start, end in ((a, head_end), (np.maximum(r * base, head_end), b)):
+            idx = start[:, None] + np.arange(base)
+            inside = idx < end[:, None]
+            idx = np.minimum(idx, len(self.y) - 1)
+            values = self.y[idx]
+            self._take(lo, idx[np.arange(len(a)), np.where(inside, values, np.inf).argmin(axis=1)], inside[:, 0], np.less)
+            self._take(hi, idx[np.arange(len(a)), np.where(inside, values, -np.inf).argmax(axis=1)], inside[:, 0], np.greater)
+        for level_lo, level_hi in self.levels:
+            take = (l < r) & (l % 2 == 1)
+            self._take(lo, level_lo[np.where(take, l, 0)], take, np.less)
+            self._take(hi, level_hi[np.where(take, l, 0)], take, np.greater)
+            l = l + take
+            take = (l < r) & (r % 2 == 1)
+            r = r - take
+            self._take(lo, level_lo[np.where(take, r, 0)], take, np.less)
+            self._take(hi, level_hi[np.where(take, r, 0)], take, np.greater)
+            l, r = l // 2, r // 2
+        return lo, hi
+
+    def _take(self, best, candidates, valid, better):
+        replace = valid & better(self.y[candidates], self.y[best])
+        best[replace] = candidates[replace]
+
+    def view(self, x0: float=None, x1: float=None, pixels: int=2000, edges=None) -> tuple:
+        """
+        (x, y) to plot for the view x0..x1 spanning `pixels` pixel columns. `edges` gives the x value of every pixel column
+        boundary instead, so the buckets line up exactly with the pixels (see `LODLine`).
+        """
+        start, stop = self.index_range(x0, x1)
+        if edges is None:
+            lo_x = self._x(0) if x0 is None else x0
+            hi_x = self._x(len(self) - 1) if x1 is None else x1
+            edges = np.linspace(lo_x, hi_x, max(pixels, 1) + 1)
+        if stop - start <= RAW_POINTS_PER_PIXEL * len(edges) or not self.levels:
+            return self._x(np.arange(start, stop)), self.y[start:stop]
+        # the first sample in each pixel column
+        inner = np.ceil(edges).clip(0, len(self)).astype(np.int64) if self.x is None else np.searchsorted(self.x, edges, side='left')
+        bounds = np.unique(np.concatenate(([start], np.clip(inner, start, stop), [stop])))
+        a, b = bounds[:-1], bounds[1:]
+        lo, hi = self.extrema(a, b)
+        # the first, lowest, highest and last sample of each pixel column, in time order
+        idx = np.sort(np.stack([a, lo, hi, b - 1], axis=1), axis=1).reshape(-1)
+        return self._x(idx), self.y[idx]
+
+class LODLine:
+    """
+    A line on `ax` that's re-decimated for the visible x range whenever the view changes. Extra keyword arguments go to
+    ax.plot. The underlying matplotlib line is `.line`. Keep a reference to the LODLine itself - matplotlib only holds weak
+    references to its callbacks.
+    """
+    def __init__(self, ax, x, y, **kwargs):
+        self.ax = ax
+        self.pyramid = y if isinstance(y, MinMaxPyramid) else MinMaxPyramid(y, x)
+        self.line, = ax.plot(*self.pyramid.view(pixels=self._pixels()), **kwargs)
+        ax.callbacks.connect('xlim_changed', self.update)
+        ax.figure.canvas.mpl_connect('resize_event', self.update)
+        self.update()
+
+    def _pixels(self) -> int:
+        return max(int(self.ax.get_window_extent().width), 1)
+
+    def _edges(self) -> np.ndarray:
+        """The x value at each pixel column boundary across the axes."""
+        bbox = self.ax.get_window_extent()
+        pixels = np.arange(np.floor(bbox.x0), np.ceil(bbox.x1) + 1)
+        return self.ax.transData.inverted().transform(np.column_stack((pixels, np.zeros_like(pixels))))[:, 0]
+
+    def update(self, *_):
+        x0, x1 = sorted(self.ax.get_xlim())
+        self.line.set_data(*self.pyramid.view(x0, x1, edges=np.sort(self._edges())))
+
+def plot_lod(ax, x, y, **kwargs):
+    """Like ax.plot(x, y, ...) for one long series (x can be None for sample numbers), drawn through a `LODLine`."""
+    return LODLine(ax, x, y, **kwargs)
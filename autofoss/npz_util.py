@@ -0,0 +1,52 @@
+import datetime
+import json
+import os
+import traceback
+import numpy as np
+from samplestore import SampleStore, SAMPLE_COLUMNS
+
+FORMAT_VERSION = 1
+
+def write_npz(samples: SampleStore, out_folder=".", fmt="autofoss_%datetime%.npz", metadata: dict=None, compress=False, prompt_on_error=True) -> str:
+    """
+    Writes a drain as a columnar NumPy archive - one array per CSV column, plus a JSON `__metadata__` entry.
+
+    Timestamps are stored as int64 epoch nanoseconds and everything else as float64, so nothing has to be parsed on load.
+    Weight isn't duplicated onto every sample: the scale readings are stored as a small side table ("Weight Timestamp" in
+    epoch ns and "Weight Reading"), and the loader rebuilds the "Current Weight" column from it with an as-of join.
+    By default the members are stored uncompressed so `plotters.recording.load_npz` can memory-map them straight out of the
+    archive; pass `compress=True` for a smaller file that has to be read into memory instead.
+    If the disk fills up, asks for ENTER and tries again - or with `prompt_on_error=False` raises the IOError instead.
+    """
+    os.makedirs(out_folder, exist_ok=True)
+    date_time = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
+    file_name = os.path.join(out_folder, fmt.replace('%datetime%', date_time))
+    meta = {
+        'format_version': FORMAT_VERSION,
+        'columns': SAMPLE_COLUMNS,
+        'samples': len(samples),
+        'created': datetime.datetime.now().isoformat(),
+    }
+    meta.update(metadata or {})
+    arrays = {name: samples.column(name) for name in SAMPLE_COLUMNS if name != 'Current Weight'}
+    if samples.weights is not None:
+        arrays['Weight Timestamp'] = samples.weights.epoch_ns()
+        arrays['Weight Reading'] = samples.weights.values()
+    else:
+        arrays['Weight Timestamp'] = np.zeros(0, dtype=np.int64)
+        arrays['Weight Reading'] = np.zeros(0, dtype=np.float64)
+    arrays['__metadata__'] = np.array(json.dumps(meta))
+    try:
+        if compress:
+            np.savez_compressed(file_name, **arrays)
+        else:
+            np.savez(file_name, **arrays)
+    # if the user runs out of disk space...
+    except IOError:
+        if not prompt_on_error:
+            raise
+        traceback.print_exc()
+        print("Error: could not write to file. Make sure you have enough disk space. Don't worry - your drain is still in memory - just free up enough space and press ENTER to try again.")
+        input("Press ENTER to try again...")
+        return write_npz(samples, out_folder=out_folder, fmt=fmt, metadata=metadata, compress=compress)
+    return file_name
@@ -1,5 +1,7 @@
 from . import weight_over_time
 from . import frf_grid
+from .recording import asof, load_npz, load_recording
+from .drain import Drain, open_drain
 from .libplotter import * # incase it's needed externally
 
 ALL_PLOTTERS = {
@@ -0,0 +1,233 @@
+import csv
+import os
+import numpy as np
+import pandas as pd
+from samplestore import asof
+from .recording import load_npz
+
+INDEX_VERSION = 1
+INDEX_BLOCK = 8192 # rows between entries of a CSV drain's row-offset index
+INDEX_CHUNK = 64 * 1024**2 # bytes read at a time while building the index
+INDEX_SUFFIX = '.idx.npz' # added to a CSV drain's path for its index - not a drain itself, though it ends in .npz
+
+class Drain:
+    """
+    Lazy, column-at-a-time access to a drain. Nothing is read until it's asked for: `column()` / `columns()` read (and
+    cache) just the named columns, and `slice(t0, t1)` / `rows()` read just the rows in a range. `frame()` is the whole
+    drain, the same DataFrame `recording.load_recording` gives.
+
+    Subclasses provide `names`, `__len__` and `_read(names, start, stop)`, which returns {name: values} for a row range
+    (`stop` None meaning to the end).
+    """
+    def __init__(self, path: str=None):
+        self.path = path
+        self.names = []
+        self._cache = {}
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.path!r}, columns={self.names})"
+
+    def _read(self, names: list, start: int, stop: int) -> dict:
+        raise NotImplementedError
+
+    def _names(self, names) -> list:
+        if names is None:
+            return list(self.names)
+        if isinstance(names, str):
+            names = [names]
+        missing = [name for name in names if name not in self.names]
+        if missing:
+            raise KeyError(f"no such column(s) in {self.path or 'drain'}: {missing}")
+        return list(names)
+
+    def column(self, name: str):
+        """All of one column, read on first use and cached."""
+        return self.columns([name])[name]
+
+    def columns(self, names=None) -> pd.DataFrame:
+        """The named columns (all of them if None) as a DataFrame. Columns not read yet are read in one pass and cached."""
+        names = self._names(names)
+        missing = [name for name in names if name not in self._cache]
+        if missing:
+            self._cache.update(self._read(missing, 0, None))
+        n_rows = len(self._cache[names[0]]) if names else len(self)
+        return pd.DataFrame({name: self._cache[name] for name in names}, index=pd.RangeIndex(n_rows))
+
+    def rows(self, start: int, stop: int, names=None) -> pd.DataFrame:
+        """Rows [start, stop) of the named columns, indexed by row number. Only those rows are read, unless cached."""
+        names = self._names(names)
+        start, stop, _ = slice(start, stop).indices(len(self))
+        stop = max(start, stop)
+        values = {name: self._cache[name][start:stop] for name in names if name in self._cache}
+        missing = [name for name in names if name not in values]
+        if missing:
+            values.update(self._read(missing, start, stop))
+        return pd.DataFrame({name: values[name] for name in names}, index=pd.RangeIndex(start, stop))
+
+    def row_range(self, t0: float=None, t1: float=None) -> tuple:
+        """The rows [start, stop) with t0 <= Elapsed < t1 (either end can be None for open-ended)."""
+        elapsed = self.column('Elapsed')
+        start = 0 if t0 is None else int(np.searchsorted(elapsed, t0, side='left'))
+        stop = len(self) if t1 is None else int(np.searchsorted(elapsed, t1, side='left'))
+        return start, max(start, stop)
+
+    def slice(self, t0: float=None, t1: float=None, names=None) -> pd.DataFrame:
+        """The named columns for t0 <= Elapsed < t1, in seconds."""
+        return self.rows(*self.row_range(t0, t1), names)
+
+    def frame(self) -> pd.DataFrame:
+        return self.columns()
+
+class FrameDrain(Drain):
+    """A DataFrame that's already in memory, behind the same interface."""
+    def __init__(self, df: pd.DataFrame, path: str=None):
+        super().__init__(path)
+        self.df = df
+        self.names = list(df.columns)
+
+    def __len__(self) -> int:
+        return len(self.df)
+
+    def _read(self, names: list, start: int, stop: int) -> dict:
+        return {name: self.df[name].array[start:stop] for name in names}
+
+    def frame(self) -> pd.DataFrame:
+        return self.df
+
+class NpzDrain(Drain):
+    """
+    A drain written by `npz_util.write_npz`. The columns are memory-mapped straight out of the archive (see
+    `recording.load_npz`), so opening only reads the archive's directory and reading a range only touches those rows.
+    """
+    def __init__(self, path: str):
+        super().__init__(path)
+        self.raw, metadata = load_npz(path)
+        self.weight_times, self.weights = self.raw.pop('Weight Timestamp', None), self.raw.pop('Weight Reading', None)
+        available = list(self.raw)
+        if 'Current Weight' not in self.raw and self.weight_times is not None:
+            available.append('Current Weight')
+        # the same column order load_recording gives
+        self.names = [name for name in metadata.get('columns', available) if name in available]
+
+    def __len__(self) -> int:
+        return len(self.raw['Timestamp'])
+
+    def _read(self, names: list, start: int, stop: int) -> dict:
+        values = {}
+        for name in names:
+            if name == 'Current Weight' and name not in self.raw:
+                values[name] = asof(self.weight_times, self.weights, self.raw['Timestamp'][start:stop])
+            elif name == 'Timestamp':
+                values[name] = pd.to_datetime(self.raw[name][start:stop], unit='ns', utc=True)
+            else:
+                values[name] = self.raw[name][start:stop]
+        return values
+
+class CsvDrain(Drain):
+    """
+    A CSV drain. Opening only reads the header. Reading whole columns parses just those columns; reading a range of rows
+    seeks straight to it using a row-offset index - the byte offset and Elapsed value of every INDEX_BLOCK-th row - which
+    is built by one pass over the file the first time it's needed, and saved next to the drain (`<drain>.idx.npz`) so
+    later opens don't have to scan it again.
+    """
+    def __init__(self, path: str):
+        super().__init__(path)
+        with open(path, newline='') as f:
+            self.names = next(csv.reader(f), [])
+        self._index = None
+
+    @property
+    def index_path(self) -> str:
+        return self.path + INDEX_SUFFIX
+
+    def index(self) -> dict:
+        """The row-offset index: 'offsets' and 'elapsed' of every INDEX_BLOCK-th row, and the number of 'rows'."""
+        if self._index is None:
+            stat = os.stat(self.path)
+            try:
+                with np.load(self.index_path) as saved:
+                    index = {name: saved[name] for name in saved.files}
+                if (int(index['version']), int(index['block']), int(index['size']), int(index['mtime_ns'])) == (INDEX_VERSION, INDEX_BLOCK, stat.st_size, stat.st_mtime_ns):
+                    self._index = index
+            except (IOError, ValueError, KeyError):
+                pass
+            if self._index is None:
+                self._index = self._build_index(stat)
+                try:
+                    np.savez(self.index_path, **self._index)
+                except IOError:
+                    pass # e.g. a read-only folder - the index is just rebuilt next time
+        return self._index
+
+    def _build_index(self, stat: os.stat_result) -> dict:
+        offsets = []
+        lines = 0 # newlines seen so far - line 0 is the header, so line L is row L - 1
+        position = 0
+        last = b'\n'
+        with open(self.path, 'rb') as f:
+            while True:
+                chunk = f.read(INDEX_CHUNK)
+                if not chunk:
+                    break
+                ends = np.flatnonzero(np.frombuffer(chunk, dtype=np.uint8) == ord('\n'))
+                # the line after each newline is row `lines + i`
+                rows = lines + np.arange(len(ends))
+                offsets.append(position + ends[rows % INDEX_BLOCK == 0] + 1)
+                lines += len(ends)
+                position += len(chunk)
+                last = chunk[-1:]
+            n_rows = max(lines - (last == b'\n'), 0)
+            offsets = np.concatenate(offsets) if offsets else np.zeros(0, dtype=np.int64)
+            offsets = offsets[:(n_rows + INDEX_BLOCK - 1) // INDEX_BLOCK].astype(np.int64)
+            elapsed = np.empty(len(offsets))
+            column = self.names.index('Elapsed') if 'Elapsed' in self.names else None
+            for i, offset in enumerate(offsets):
+                f.seek(offset)
+                elapsed[i] = float(f.readline().split(b',')[column]) if column is not None else np.nan
+        return {'offsets': offsets, 'elapsed': elapsed, 'rows': np.int64(n_rows), 'version': INDEX_VERSION,
+                'block': INDEX_BLOCK, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    def __len__(self) -> int:
+        if self._index is None and self._cache:
+            # a whole column has been read already, so there's no need to scan the file for the row count
+            return len(next(iter(self._cache.values())))
+        return int(self.index()['rows'])
+
+    def _read(self, names: list, start: int, stop: int) -> dict:
+        usecols = [self.names.index(name) for name in names]
+        if start == 0 and stop is None:
+            df = pd.read_csv(self.path, usecols=usecols)
+        else:
+            stop = len(self) if stop is None else stop
+            if stop <= start:
+                return {name: np.zeros(0) for name in names}
+            block, skip = divmod(start, INDEX_BLOCK)
+            with open(self.path, 'rb') as f:
+                f.seek(int(self.index()['offsets'][block]))
+                df = pd.read_csv(f, header=None, names=self.names, usecols=usecols, skiprows=skip, nrows=stop - start)
+        return {name: df[name].to_numpy() for name in names}
+
+    def row_range(self, t0: float=None, t1: float=None) -> tuple:
+        if 'Elapsed' in self._cache or not len(self):
+            return super().row_range(t0, t1)
+        return self._row_at(t0, 0), max(self._row_at(t0, 0), self._row_at(t1, len(self)))
+
+    def _row_at(self, t: float, default: int) -> int:
+        """The first row with Elapsed >= t, reading only the index block it's in."""
+        if t is None:
+            return default
+        index = self.index()
+        block = max(int(np.searchsorted(index['elapsed'], t, side='left')) - 1, 0)
+        start = block * INDEX_BLOCK
+        elapsed = self.rows(start, start + INDEX_BLOCK, ['Elapsed'])['Elapsed'].to_numpy()
+        # if every row of the block comes before t, the next block (or the end of the drain) is the answer
+        return start + int(np.searchsorted(elapsed, t, side='left'))
+
+def open_drain(path: str) -> Drain:
+    """Opens a drain recording (.csv or .npz) without reading any of its data yet."""
+    if path.lower().endswith('.npz'):
+        return NpzDrain(path)
+    return CsvDrain(path)
@@ -1,40 +1,47 @@
-from .libplotter import Plotter, tfestimate, track_to_microstrain
+from .libplotter import Plotter, track_to_microstrain
+from .spectral import frf_grid
+from .spectral_cache import SpectralCache
 import matplotlib.pyplot as plt
 from tkinter.simpledialog import askstring
 import numpy as np
 
 class FRFGridPlotter(Plotter):
-    def __init__(self, df):
-        super().__init__(df)
+    def __init__(self, df, path=None, cache: SpectralCache=None):
+        super().__init__(df, path)
+        self.cache = cache or SpectralCache()
         self.fs = 19320              # samples/sec
         self.T = 0.2                 # 0.2 seconds
+        self.nperseg, self.noverlap = 256, 128
         self.f1, self.f2 = 200, 5000 # frequency limits in Hz
         self.EPSILON = 1e-10         # for numerical stability
         self.trackWIdx = 2           # column index of weight track
         self.tracksRange = (3, 10)   # column indices of COG tracks
     
-    def plot(self):
-        tStart = float(askstring("MPG-FOSS", "Enter the start time (in seconds):", initialvalue="0"))
-        trackW = self.df.iloc[:, self.trackWIdx]
-        tracks = [self.df.iloc[:, i] for i in range(*self.tracksRange) if i != self.trackWIdx]
-        tracks = [track_to_microstrain(track) for track in tracks]
+    def compute(self, tStart: float) -> dict:
+        names = [self.drain.names[i] for i in range(*self.tracksRange) if i != self.trackWIdx]
+        tracks = self.columns(names)
+        tracks = [track_to_microstrain(tracks[name]) for name in names]
         winStartIdx = int(np.floor(tStart * self.fs)) + 1
         nWindows = int(np.floor((len(tracks[0]) - winStartIdx + 1) / (self.fs * self.T)))
+        winLen = int(self.fs * self.T)
+        # every track is segmented and FFT'd once, and all 42 track pairs come out of the same batch of spectra
+        fVec, H_avg, auto = frf_grid(np.stack([np.asarray(track) for track in tracks]), self.fs, winStartIdx, nWindows, winLen, self.nperseg, self.noverlap)
+        return {'fVec': fVec, 'H_avg': H_avg, 'auto': auto}
+
+    def plot(self, tStart: float=None):
+        if tStart is None:
+            tStart = float(askstring("MPG-FOSS", "Enter the start time (in seconds):", initialvalue="0"))
+        # only these go into the cache key - f1/f2 are applied afterwards, so changing them reuses the cached FRFs
+        params = dict(tStart=tStart, fs=self.fs, T=self.T, nperseg=self.nperseg, noverlap=self.noverlap, tracks=list(range(*self.tracksRange)))
+        spectra = self.cache.cached(self.path, lambda: self.compute(tStart), **params)
+        fVec, H_avg = spectra['fVec'], spectra['H_avg']
+        freqIndices = (fVec >= self.f1) & (fVec <= self.f2)
         plt.figure(figsize=(20, 15))
         loop_amt = self.tracksRange[1] - self.tracksRange[0]
         for i in range(loop_amt):
             for j in range(loop_amt):
                 if i != j:
-                    H_sum = 0
-                    for w in range(nWindows):
-                        winStart = winStartIdx + w * int(self.fs * self.T)
-                        segment1 = tracks[i][winStart:winStart + int(self.fs * self.T)]
-                        segment2 = tracks[j][winStart:winStart + int(self.fs * self.T)]
-                        H, fVec = tfestimate(segment1, segment2, self.fs)
-                        H_sum += H
-                    H_avg = H_sum / nWindows
-                    H_mag = np.abs(H_avg)
-                    freqIndices = (fVec >= self.f1) & (fVec <= self.f2)
+                    H_mag = np.abs(H_avg[i, j])
                     plt.subplot(loop_amt, loop_amt, i * loop_amt + j + 1)
                     plt.plot(fVec[freqIndices], H_mag[freqIndices])
                     plt.title(f'Track {i+1} to Track {j+1}')
@@ -1,10 +1,32 @@
 import numpy as np
 from scipy import signal
 import pandas as pd
+from conversions import wavelength_to_microstrain
+from .drain import Drain, FrameDrain
 
 class Plotter:
-    def __init__(self, df: pd.DataFrame):
-        self.df = df
+    def __init__(self, df, path: str=None):
+        """
+        `df` is the drain - a DataFrame, or a `drain.Drain` from `open_drain`, in which case only the columns and rows the
+        plotter asks for through `columns()` / `slice()` are ever read. `self.df` is still there for the whole thing.
+        """
+        self.drain = df if isinstance(df, Drain) else FrameDrain(df, path)
+        self.path = path if path is not None else self.drain.path # the drain file, if any - used to cache expensive results
+        self._df = df if isinstance(df, pd.DataFrame) else None
+
+    @property
+    def df(self) -> pd.DataFrame:
+        if self._df is None:
+            self._df = self.drain.frame()
+        return self._df
+
+    def columns(self, names=None) -> pd.DataFrame:
+        """Just the named columns of the drain (all of them if None)."""
+        return self.drain.columns(names)
+
+    def slice(self, t0: float=None, t1: float=None, names=None) -> pd.DataFrame:
+        """The named columns (all of them if None) for t0 <= Elapsed < t1, in seconds."""
+        return self.drain.slice(t0, t1, names)
     
     def plot(self):
         raise NotImplementedError("plot method not implemented in child class")
@@ -25,7 +47,7 @@ def track_to_microstrain(track):
     Returns:
     - track: Track data in microstrain.
     """
-    return (track - track.iloc[0]) / track.iloc[0] * (1 / (1 - 0.22)) * 1e6
+    return wavelength_to_microstrain(track, track.iloc[0])
 
 
 def tfestimate(segment1, segment2, fs):
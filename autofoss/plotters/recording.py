@@ -0,0 +1,60 @@
+import json
+import struct
+import zipfile
+import numpy as np
+import pandas as pd
+from samplestore import asof
+
+def _member_data_offset(f, info: zipfile.ZipInfo) -> int:
+    # the local file header is 30 bytes, followed by the file name and an extra field whose lengths are stored in the header
+    f.seek(info.header_offset)
+    header = f.read(30)
+    name_len, extra_len = struct.unpack('<HH', header[26:30])
+    return info.header_offset + 30 + name_len + extra_len
+
+def load_npz(path: str) -> tuple:
+    """
+    Opens a drain written by `npz_util.write_npz`.
+
+    Returns (columns, metadata), where columns maps column names to arrays. Uncompressed members are memory-mapped straight
+    out of the archive, so nothing is read from disk until a column is actually used; compressed members are read in full.
+    The weight side table is returned as-is ("Weight Timestamp" / "Weight Reading") - see `load_recording` for the joined column.
+    """
+    columns = {}
+    metadata = {}
+    with zipfile.ZipFile(path) as zf, open(path, 'rb') as f:
+        for info in zf.infolist():
+            name = info.filename[:-len('.npy')] if info.filename.endswith('.npy') else info.filename
+            if name == '__metadata__':
+                with zf.open(info) as member:
+                    metadata = json.loads(str(np.lib.format.read_array(member)))
+                continue
+            if info.compress_type != zipfile.ZIP_STORED:
+                with zf.open(info) as member:
+                    columns[name] = np.lib.format.read_array(member)
+                continue
+            f.seek(_member_data_offset(f, info))
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            if dtype.hasobject or shape == () or 0 in shape:
+                with zf.open(info) as member:
+                    columns[name] = np.lib.format.read_array(member)
+                continue
+            columns[name] = np.memmap(path, dtype=dtype, mode='r', offset=f.tell(), shape=shape, order='F' if fortran_order else 'C')
+    order = metadata.get('columns', []) + [name for name in columns if name not in metadata.get('columns', [])]
+    return {name: columns[name] for name in order if name in columns}, metadata
+
+def load_recording(path: str) -> pd.DataFrame:
+    """Loads a drain into a DataFrame with the same column layout as the CSV files, whichever format it was saved in."""
+    if path.lower().endswith('.npz'):
+        columns, metadata = load_npz(path)
+        weight_times, weights = columns.pop('Weight Timestamp', None), columns.pop('Weight Reading', None)
+        if 'Current Weight' not in columns and weight_times is not None:
+            columns['Current Weight'] = asof(weight_times, weights, columns['Timestamp'])
+        columns['Timestamp'] = pd.to_datetime(columns['Timestamp'], unit='ns', utc=True)
+        order = [name for name in metadata.get('columns', columns.keys()) if name in columns]
+        return pd.DataFrame({name: columns[name] for name in order})
+    return pd.read_csv(path)
@@ -0,0 +1,39 @@
+import numpy as np
+from spectra import segment_starts, window_ffts, cross_spectra, transfer_functions
+
+def window_batches(n_samples: int, win_start: int, n_windows: int, win_len: int, batch: int=64):
+    """
+    Yields (window start indices, window length) in batches of up to `batch` windows. A last window that runs past the end
+    of the data (which the 1-based start index in the FRF plots allows) comes in a batch of its own, with its real length.
+    """
+    full = n_windows
+    if n_windows and win_start + n_windows * win_len > n_samples:
+        full -= 1
+    for first in range(0, full, batch):
+        yield win_start + np.arange(first, min(first + batch, full)) * win_len, win_len
+    if full < n_windows:
+        last = win_start + full * win_len
+        yield np.array([last]), n_samples - last
+
+def frf_grid(data: np.ndarray, fs: float, win_start: int, n_windows: int, win_len: int, nperseg: int=256, noverlap: int=128, batch: int=64) -> tuple:
+    """
+    Average transfer function between every pair of tracks over `n_windows` consecutive windows of `win_len` samples.
+
+    Gives the same H_avg as calling `tfestimate` on each window of each track pair and averaging, but every track is
+    segmented and FFT'd once and all the spectra come from batched products. Windows are processed `batch` at a time to
+    keep memory bounded on long drains.
+
+    Returns (fVec, H_avg, auto), where H_avg is (tracks, tracks, freqs) and auto is the (unscaled) auto-spectrum of each
+    track in each window, as a (windows, tracks, freqs) array.
+    """
+    data = np.asarray(data, dtype=np.float64)
+    n_tracks = data.shape[0]
+    fVec = np.fft.rfftfreq(nperseg, 1 / fs)
+    H_sum = np.zeros((n_tracks, n_tracks, len(fVec)), dtype=np.complex128)
+    auto = np.empty((n_windows, n_tracks, len(fVec)))
+    for win_starts, length in window_batches(data.shape[1], win_start, n_windows, win_len, batch):
+        S = cross_spectra(window_ffts(data, win_starts, length, nperseg, noverlap))
+        H_sum += transfer_functions(S).sum(axis=0)
+        first = (win_starts[0] - win_start) // win_len
+        auto[first:first + len(win_starts)] = np.einsum('wiif->wif', S).real
+    return fVec, H_sum / n_windows, auto
@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+import tempfile
+import numpy as np
+
+CACHE_VERSION = 1 # bump whenever the spectral engine changes what it computes
+DEFAULT_DIR = os.environ.get('AUTOFOSS_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.autofoss', 'spectral_cache'))
+DEFAULT_MAX_BYTES = 2 * 1024**3
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class SpectralCache:
+    """
+    Content-addressed disk cache for spectral products (FRFs, auto-spectra, ...) of a drain.
+
+    Entries are keyed by the SHA-256 of the drain file plus the analysis parameters, so renaming or copying a drain still
+    hits the cache and re-recording one never does. Hashing a big drain takes a while, so the hash of each file is
+    remembered by (path, size, modification time). Entries are .npz files; reading one bumps its modification time, and
+    the least recently used entries are deleted whenever the cache grows past `max_bytes`.
+
+    Several processes can share the cache (e.g. report.py's workers): every file is written to a temporary file and moved
+    into place, each drain's hash has a record of its own, and an entry that another process deletes in the meantime is
+    just a miss.
+    """
+    def __init__(self, directory: str=DEFAULT_DIR, max_bytes: int=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._hashes_dir = os.path.join(directory, 'hashes')
+
+    def file_hash(self, path: str) -> str:
+        stat = os.stat(path)
+        path = os.path.abspath(path)
+        # one record per drain, so processes hashing different drains never overwrite each other's
+        record = os.path.join(self._hashes_dir, hashlib.sha256(path.encode('utf-8')).hexdigest() + '.json')
+        try:
+            with open(record) as f:
+                known = json.load(f)
+            if known['path'] == path and known['size'] == stat.st_size and known['mtime_ns'] == stat.st_mtime_ns:
+                return known['sha256']
+        except (IOError, ValueError, KeyError):
+            pass
+        digest = _sha256(path)
+        os.makedirs(self._hashes_dir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self._hashes_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'path': path, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest}, f)
+        os.replace(tmp, record)
+        return digest
+
+    def key(self, path: str, **params) -> str:
+        params = dict(params, file=self.file_hash(path), version=CACHE_VERSION)
+        return hashlib.sha256(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def _entry(self, key: str) -> str:
+        return os.path.join(self.directory, key + '.npz')
+
+    def get(self, key: str) -> dict:
+        """Returns the cached arrays for `key`, or None if there aren't any."""
+        entry = self._entry(key)
+        try:
+            with np.load(entry) as data:
+                arrays = {name: data[name] for name in data.files}
+        except (IOError, ValueError):
+            return None
+        try:
+            os.utime(entry) # mark as recently used
+        except FileNotFoundError:
+            pass # evicted by another process since - the arrays are loaded already, though
+        return arrays
+
+    def put(self, key: str, **arrays):
+        os.makedirs(self.directory, exist_ok=True)
+        # write to a temporary file first so a half-written entry is never picked up
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, self._entry(key))
+        self.evict()
+
+    def evict(self):
+        """Deletes the least recently used entries until the cache fits in `max_bytes`."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.npz'):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    continue # another process evicted it first
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def cached(self, path: str, compute, **params) -> dict:
+        """
+        Returns the arrays `compute()` would produce for the drain at `path` with these `params`, from the cache if possible.
+        If `path` is None (e.g. a drain that's not from a file) the cache is skipped.
+        """
+        if path is None:
+            return compute()
+        key = self.key(path, **params)
+        arrays = self.get(key)
+        if arrays is None:
+            arrays = compute()
+            self.put(key, **arrays)
+        return arrays
@@ -1,9 +1,16 @@
 from .libplotter import Plotter
+from lod import LODLine
 import matplotlib.pyplot as plt
 
 class WeightOverTimePlotter(Plotter):
     def plot(self):
-        self.df.plot(x="Elapsed", y="Current Weight", title="Weight Over Time")
+        data = self.columns(["Elapsed", "Current Weight"])
+        fig, ax = plt.subplots()
+        # a drain is millions of samples - only draw what each pixel needs, and redo it on zoom
+        self.line = LODLine(ax, data["Elapsed"].to_numpy(), data["Current Weight"].to_numpy(), label="Current Weight")
+        ax.set_title("Weight Over Time")
+        ax.set_xlabel("Elapsed")
+        ax.legend()
     
     def show(self):
         plt.show()
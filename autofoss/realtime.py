@@ -0,0 +1,122 @@
+import queue
+import threading
+import time
+import numpy as np
+from spectra import window_ffts, cross_spectra, transfer_functions
+from samplestore import WeightSeries
+from conversions import wavelength_to_microstrain
+
+class StreamingFRFEstimator:
+    """
+    Computes transfer functions between the FOSS tracks while a drain is being recorded.
+
+    `feed()` is called from the Gator callback with each batch of samples. It converts them to microstrain (relative to the
+    first sample, like the FRF plots do) and copies them into a ring buffer of whole windows (`T` seconds each). Every time a
+    window fills up, a worker thread computes its Welch spectra and the H1 transfer function between every pair of tracks
+    with the same engine as the FRF grid plot, and publishes the result as `latest`, together with the weight at the end of
+    the window and a running average over the drain. Callbacks added with `subscribe()` get the same dict.
+
+    If the worker falls so far behind that the ring buffer would be overwritten, the newest window is dropped (and counted
+    in `dropped`) rather than blocking the Gator callback - pass `drop_when_behind=False` to block instead, e.g. when
+    replaying a file faster than real time. `cpu_times` holds the CPU time spent on each window.
+    """
+    def __init__(self, sample_rate: float, T: float=0.2, tracks=range(7), nperseg: int=256, noverlap: int=128, ring_windows: int=8, drop_when_behind: bool=True):
+        self.sample_rate = sample_rate
+        self.win_len = int(sample_rate * T)
+        self.tracks = list(tracks)
+        self.nperseg = nperseg
+        self.noverlap = noverlap
+        self.ring = np.empty((ring_windows, len(self.tracks), self.win_len))
+        # a slot can be being filled, queued or processed - keep the queue short enough that none is overwritten in use
+        self.queue = queue.Queue(maxsize=ring_windows - 2)
+        self.drop_when_behind = drop_when_behind
+        self.weights = None
+        self.subscribers = []
+        self.t = None
+        self.reset()
+
+    def reset(self):
+        self.reference = None
+        self.slot = 0
+        self.filled = 0
+        self.windows = 0
+        self.dropped = 0
+        self.cpu_times = []
+        self.latest = None
+        self._H_sum = None
+
+    def subscribe(self, callback):
+        """`callback(result)` is called from the worker thread with every window's result."""
+        self.subscribers.append(callback)
+
+    def start(self, weights: WeightSeries=None) -> 'StreamingFRFEstimator':
+        self.reset()
+        self.weights = weights
+        self.t = threading.Thread(target=self.thread, daemon=True)
+        self.t.start()
+        return self
+
+    def stop(self):
+        """Processes whatever windows are still queued and stops the worker. A partly filled window is discarded."""
+        self.queue.put(None)
+        self.t.join()
+
+    def feed(self, timestamps_ns, sensors):
+        """Adds a batch of samples. `sensors` is the (n, 8) array of wavelengths in nm from `gator.convert_batch`."""
+        data = sensors[:, self.tracks]
+        if self.reference is None:
+            self.reference = data[0].copy()
+        data = wavelength_to_microstrain(data, self.reference)
+        i = 0
+        while i < len(data):
+            n = min(len(data) - i, self.win_len - self.filled)
+            self.ring[self.slot, :, self.filled:self.filled + n] = data[i:i + n].T
+            self.filled += n
+            i += n
+            if self.filled == self.win_len:
+                self._window_done(int(timestamps_ns[i - 1]))
+
+    def _window_done(self, end_ns: int):
+        weight = float(self.weights.asof([end_ns])[0]) if self.weights is not None else 0.0
+        try:
+            self.queue.put((self.windows, self.slot, end_ns, weight), block=not self.drop_when_behind)
+            self.slot = (self.slot + 1) % len(self.ring)
+        except queue.Full:
+            self.dropped += 1 # reuse the slot - the worker hasn't got to it yet
+        self.windows += 1
+        self.filled = 0
+
+    def process(self, index: int, slot: int, end_ns: int, weight: float) -> dict:
+        cpu_start = time.thread_time()
+        S = cross_spectra(window_ffts(self.ring[slot], [0], self.win_len, self.nperseg, self.noverlap))
+        H = transfer_functions(S)[0]
+        self._H_sum = H if self._H_sum is None else self._H_sum + H
+        processed = len(self.cpu_times) + 1
+        cpu = time.thread_time() - cpu_start
+        self.cpu_times.append(cpu)
+        return {
+            'window': index,
+            'timestamp': end_ns,
+            'weight': weight,
+            'fVec': np.fft.rfftfreq(self.nperseg, 1 / self.sample_rate),
+            'H': H,
+            'auto': np.einsum('iif->if', S[0]).real,
+            'H_avg': self._H_sum / processed,
+            'cpu_time': cpu,
+        }
+
+    def thread(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                break
+            self.latest = self.process(*job)
+            for callback in self.subscribers:
+                callback(self.latest)
+
+    def cpu_summary(self) -> str:
+        if not self.cpu_times:
+            return 'no windows processed'
+        cpu = np.array(self.cpu_times) * 1000
+        budget = self.win_len / self.sample_rate * 1000
+        return f'{len(cpu)} windows, {cpu.mean():.1f} ms CPU per window on average ({cpu.max():.1f} ms max, {budget:.0f} ms budget), {self.dropped} dropped'
@@ -1,10 +1,10 @@
 from component import AutofossComponent, ComponentManager
 import threading
-import datetime
 import time
 
 class AutofossRefiller(AutofossComponent):
     def __init__(self, manager: ComponentManager, threshold=3.65, extra=5.0):
+        self.manager = manager
         self.power = manager.get('power')
         self.scale = manager.get('scale')
         self.threshold = threshold
@@ -13,16 +13,14 @@ class AutofossRefiller(AutofossComponent):
         self.extra = extra
 
     def start(self):
+        self.manager.clear('refilled')
         self.t = threading.Thread(target=self.refill_thread)
         self.t.start()
 
     def wait_for_refill(self, timeout_secs=None) -> bool:
-        if timeout_secs:
-            start_time = datetime.datetime.now().timestamp()
         try:
-            while not self.refilled:
-                if timeout_secs and datetime.datetime.now().timestamp() - start_time > timeout_secs:
-                    return False
+            if not self.manager.wait_for('refilled', timeout=timeout_secs or None):
+                return False
         except KeyboardInterrupt:
             print("Refill interrupted! Halting immediately.")
             return False
@@ -30,6 +28,7 @@ class AutofossRefiller(AutofossComponent):
 
     def stop(self):
         self.refilled = True
+        self.manager.signal('refilled')
         self.t.join()
 
     def reset(self):
@@ -59,6 +58,7 @@ class AutofossRefiller(AutofossComponent):
         start_weight = weight
         if weight < self.threshold:
             self.refilled = True
+            self.manager.signal('refilled')
             return  # no need to refill, tank is already full
         self.power.on(2)
         i = 0
@@ -76,6 +76,7 @@ class AutofossRefiller(AutofossComponent):
                 break
             if i % 100 == 0:
                 print(f"Refilling tank... currently at {weight}lbs, {'{0:.2f}'.format(self.refill_progress)}% full")
+        self.manager.signal('refilled')
         print("Tank refilled.")
         
     def pause(self):
@@ -0,0 +1,186 @@
+"""
+Renders plotter figures for a batch of drains without any windows or dialogs, e.g. to regenerate a whole campaign's
+figures overnight.
+
+Every drain gets one file per plotter and format in the output folder, named after the drain's file name (extension
+included, so `x.csv` and `x.npz` don't collide), the plotter and its parameters
+(`<drain>.<csv|npz>_<plotter>[_<param>-<value>...].<format>`). Drains are rendered in parallel, one per worker process,
+with matplotlib's Agg backend. A figure that's newer than both its drain and the plotting code (the plotters package and
+the autofoss modules it uses) is up to date and isn't rendered again, so re-running after adding drains only renders
+what's new. Parameters a plotter would ask for in a dialog (like grid-of-frfs's tStart) have to be given in the spec.
+"""
+import matplotlib
+matplotlib.use('Agg') # before anything imports pyplot - the plotters only ever call plt.show() in interactive use
+
+import argparse
+import glob
+import inspect
+import json
+import os
+import re
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import matplotlib.pyplot as plt
+import plotters
+from plotters.drain import INDEX_SUFFIX
+
+def slug(name: str) -> str:
+    return re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-')
+
+PLOTTERS = {slug(name): plotter for name, plotter in plotters.ALL_PLOTTERS.items()}
+
+def parse_plot(spec: str) -> tuple:
+    """
+    "grid-of-frfs:tStart=5" -> ("grid-of-frfs", {"tStart": 5}). The plotter can be given by its name in ALL_PLOTTERS or
+    its slug, and values are parsed as JSON where they can be (numbers, true/false, lists) and kept as strings otherwise.
+    """
+    name, _, params_spec = spec.partition(':')
+    key = slug(name)
+    if key not in PLOTTERS:
+        raise ValueError(f"unknown plotter {name!r} - choose from {', '.join(PLOTTERS)}")
+    params = {}
+    for param in filter(None, params_spec.split(',')):
+        param_name, sep, value = param.partition('=')
+        if not sep:
+            raise ValueError(f"plotter parameters are name=value, got {param!r}")
+        try:
+            params[param_name.strip()] = json.loads(value)
+        except ValueError:
+            params[param_name.strip()] = value.strip()
+    # a parameter left as None is asked for in a dialog, which can't work here
+    asked = [name for name, param in inspect.signature(PLOTTERS[key].plot).parameters.items() if param.default is None and name not in params]
+    if asked:
+        raise ValueError(f"{key} needs {', '.join(name + '=' for name in asked)} (e.g. \"{key}:{asked[0]}=0\")")
+    return key, params
+
+def output_path(out_dir: str, drain: str, key: str, params: dict, fmt: str) -> str:
+    name = os.path.basename(drain) + '_' + key
+    name += ''.join(f"_{slug(param)}-{slug(str(value))}" for param, value in sorted(params.items()))
+    return os.path.join(out_dir, f"{name}.{fmt}")
+
+def code_mtime() -> float:
+    """When the plotting code last changed: every module in the plotters package, and the autofoss modules loaded with it."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    sources = set(glob.glob(os.path.join(os.path.dirname(os.path.abspath(plotters.__file__)), '*.py')))
+    for module in list(sys.modules.values()):
+        source = os.path.abspath(getattr(module, '__file__', None) or os.devnull)
+        if os.path.dirname(source) == here and source != os.path.abspath(__file__):
+            sources.add(source)
+    return max(os.path.getmtime(source) for source in sources)
+
+def up_to_date(path: str, drain: str, code_changed: float) -> bool:
+    """Whether `path` was written after both the drain and the plotting code (`code_mtime()`) last changed."""
+    try:
+        written = os.path.getmtime(path)
+    except OSError:
+        return False
+    return written >= max(os.path.getmtime(drain), code_changed)
+
+def render_drain(drain: str, jobs: list) -> list:
+    """
+    Renders one drain's figures. `jobs` is a list of (plotter key, params, [output paths]) - the drain is opened once and
+    its column cache shared by all of them. Returns (output path, seconds, error) for each output.
+    """
+    results = []
+    data = plotters.open_drain(drain)
+    for key, params, paths in jobs:
+        start = time.perf_counter()
+        try:
+            plotter = PLOTTERS[key](data, drain)
+            plotter.plot(**params)
+            for path in paths:
+                # write next to the real file and move it into place, so an interrupted run never leaves a figure that
+                # looks up to date
+                root, ext = os.path.splitext(path)
+                tmp = f"{root}.tmp{ext}"
+                plotter.save(tmp)
+                os.replace(tmp, path)
+            error = None
+        except Exception:
+            error = traceback.format_exc()
+        finally:
+            plt.close('all')
+        elapsed = time.perf_counter() - start
+        results.extend((path, elapsed, error) for path in paths)
+    return results
+
+def find_drains(patterns: list) -> list:
+    """The drains in `patterns` (files, globs or folders), leaving out the row-offset indexes saved next to CSV drains."""
+    drains = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = sorted(glob.glob(os.path.join(pattern, '*.csv')) + glob.glob(os.path.join(pattern, '*.npz')))
+        else:
+            matches = sorted(glob.glob(pattern)) or [pattern]
+        drains.extend(path for path in matches if path not in drains and not path.endswith(INDEX_SUFFIX))
+    return drains
+
+def main() -> int:
+    """
+examples:
+  python report.py drains/ -p weight-over-time -p "grid-of-frfs:tStart=5"
+  python report.py "drains/autofoss_2024*.npz" -p "Grid of FRFs:tStart=2" -f png svg -o reports -j 4
+    """
+    parser = argparse.ArgumentParser(description="Render plotter figures for a batch of drains, headless", epilog=main.__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("drains", help="Drain files (.csv or .npz), glob patterns or folders of drains", nargs="+")
+    parser.add_argument("-p", "--plot", help=f"Plotter to render, with optional parameters as name:param=value,... (repeat for more). One of: {', '.join(PLOTTERS)}", action="append", default=[])
+    parser.add_argument("-f", "--format", help="Output format(s)", nargs="+", choices=["png", "svg", "pdf"], default=["png"])
+    parser.add_argument("-o", "--out-dir", help="Output directory for the figures", default="reports")
+    parser.add_argument("-j", "--jobs", help="Number of drains to render at once (default: one per CPU)", type=int, default=os.cpu_count())
+    parser.add_argument("--force", help="Render every figure, even ones that are up to date", action="store_true")
+    args = parser.parse_args()
+    try:
+        plots = [parse_plot(spec) for spec in args.plot or ["weight-over-time"]]
+    except ValueError as e:
+        parser.error(str(e))
+
+    drains = find_drains(args.drains)
+    missing = [drain for drain in drains if not os.path.isfile(drain)]
+    if missing:
+        parser.error(f"no such drain(s): {', '.join(missing)}")
+    # two workers must never write the same figure, e.g. for drains with the same name in different folders
+    same_name = {}
+    for drain in drains:
+        same_name.setdefault(os.path.basename(drain), []).append(drain)
+    clashes = [paths for paths in same_name.values() if len(paths) > 1]
+    if clashes:
+        parser.error(f"drains with the same file name would overwrite each other's figures: {'; '.join(', '.join(paths) for paths in clashes)}")
+    os.makedirs(args.out_dir, exist_ok=True)
+
+    work = {}
+    skipped = 0
+    code_changed = code_mtime()
+    for drain in drains:
+        for key, params in plots:
+            paths = [output_path(args.out_dir, drain, key, params, fmt) for fmt in args.format]
+            stale = [path for path in paths if args.force or not up_to_date(path, drain, code_changed)]
+            skipped += len(paths) - len(stale)
+            if stale:
+                work.setdefault(drain, []).append((key, params, stale))
+    print(f"{len(drains)} drain(s), {sum(len(paths) for jobs in work.values() for _, _, paths in jobs)} figure(s) to render, {skipped} up to date")
+
+    failed = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max(1, min(args.jobs, len(work) or 1))) as pool:
+        futures = {pool.submit(render_drain, drain, jobs): drain for drain, jobs in work.items()}
+        for future in as_completed(futures):
+            try:
+                results = future.result()
+            except Exception:
+                # the drain itself couldn't be opened (or the worker died)
+                print(f"FAILED {futures[future]}:\n{traceback.format_exc()}", file=sys.stderr)
+                failed += sum(len(paths) for _, _, paths in work[futures[future]])
+                continue
+            for path, elapsed, error in results:
+                if error:
+                    failed += 1
+                    print(f"FAILED {path}:\n{error}", file=sys.stderr)
+                else:
+                    print(f"{path} ({elapsed:.1f}s)")
+    print(f"Done in {time.perf_counter() - start:.1f}s" + (f", {failed} figure(s) failed" if failed else ""))
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,199 @@
+import datetime
+import time
+import numpy as np
+
+SENSOR_COLUMNS = [f'Sensor {i}' for i in range(1, 9)]
+SAMPLE_COLUMNS = ['Timestamp', 'Elapsed', 'Current Weight'] + SENSOR_COLUMNS
+
+def ns_to_isoformat(timestamp_ns: int) -> str:
+    # same format as datetime.datetime.now().isoformat(), which is what the old list-of-dicts stored
+    seconds, ns = divmod(int(timestamp_ns), 1_000_000_000)
+    return (datetime.datetime.fromtimestamp(seconds) + datetime.timedelta(microseconds=ns // 1000)).isoformat()
+
+def ns_to_isoformat_array(timestamps_ns: np.ndarray) -> np.ndarray:
+    """Vectorized `ns_to_isoformat` for a chunk of timestamps (the local UTC offset is taken from the first one)."""
+    if len(timestamps_ns) == 0:
+        return np.array([], dtype=str)
+    offset = datetime.datetime.fromtimestamp(int(timestamps_ns[0]) // 1_000_000_000).astimezone().utcoffset()
+    local_ns = np.asarray(timestamps_ns, dtype=np.int64) + int(offset.total_seconds()) * 1_000_000_000
+    return local_ns.astype('datetime64[ns]').astype('datetime64[us]').astype(str)
+
+def grow(array: np.ndarray, size: int, needed: int) -> np.ndarray:
+    """Returns `array` if it can hold `needed` rows, otherwise a copy of its first `size` rows with the capacity doubled until it can."""
+    if needed <= len(array):
+        return array
+    capacity = max(len(array), 1)
+    while capacity < needed:
+        capacity *= 2
+    new = np.empty((capacity,) + array.shape[1:], dtype=array.dtype)
+    new[:size] = array[:size]
+    return new
+
+def asof(times: np.ndarray, values: np.ndarray, at) -> np.ndarray:
+    """
+    As-of join of a sparse (times, values) series, `times` sorted: the value at each point in `at` is the most recent one
+    at or before it (points before the first get the first value). Returns zeros if the series is empty.
+    """
+    at = np.asarray(at)
+    if len(times) == 0:
+        return np.zeros(at.shape)
+    idx = np.searchsorted(times, at, side='right') - 1
+    return values[np.clip(idx, 0, None)]
+
+class WeightSeries:
+    """
+    Time series of scale readings, recorded as they arrive rather than stamped onto every Gator sample.
+
+    Readings are stored as (monotonic ns, weight). The offset between the monotonic and wall clocks is captured when the
+    series is created so the readings can be lined up against the Gator's epoch timestamps with `asof()`.
+    """
+    def __init__(self, capacity: int=4096):
+        self.size = 0
+        self.times = np.empty(capacity, dtype=np.int64)
+        self.weights = np.empty(capacity, dtype=np.float64)
+        self.epoch_offset_ns = time.time_ns() - time.monotonic_ns()
+
+    def append(self, monotonic_ns: int, weight: float):
+        self.times = grow(self.times, self.size, self.size + 1)
+        self.weights = grow(self.weights, self.size, self.size + 1)
+        self.times[self.size] = monotonic_ns
+        self.weights[self.size] = weight
+        self.size += 1
+
+    def __len__(self) -> int:
+        return self.size
+
+    def copy(self) -> 'WeightSeries':
+        """Snapshot of the readings so far, unaffected by later appends."""
+        series = WeightSeries(capacity=max(self.size, 1))
+        series.times[:self.size] = self.times[:self.size]
+        series.weights[:self.size] = self.weights[:self.size]
+        series.size = self.size
+        series.epoch_offset_ns = self.epoch_offset_ns
+        return series
+
+    def epoch_ns(self) -> np.ndarray:
+        """Arrival times of the readings as epoch nanoseconds."""
+        return self.times[:self.size] + self.epoch_offset_ns
+
+    def values(self) -> np.ndarray:
+        return self.weights[:self.size]
+
+    def asof(self, timestamps_ns) -> np.ndarray:
+        """
+        As-of join: the weight at each epoch-ns timestamp is the most recent reading at or before it (samples from before
+        the first reading get the first reading). Returns zeros if there are no readings at all.
+        """
+        return asof(self.epoch_ns(), self.values(), timestamps_ns)
+
+class SampleStore:
+    """
+    Growable, preallocated column store for Gator samples.
+
+    Holding every sample as an 11-key dict costs roughly a kilobyte per sample, which adds up to gigabytes on a long drain at 19.32 kHz.
+    This keeps each column in its own NumPy array instead (timestamps as int64 epoch nanoseconds, everything else float64), and
+    doubles the capacity whenever it fills up so appends stay amortized O(1).
+
+    Weight isn't stored per sample - the scale keeps its own `WeightSeries`, and the "Current Weight" column is produced from
+    it with an as-of join when it's asked for. Attach the series with the `weights` attribute.
+
+    Rows can still be read back as the same dicts `write_csv` and the plotters have always used - see `row()` and `__iter__()`.
+    """
+    def __init__(self, capacity: int=2**16, num_sensors: int=len(SENSOR_COLUMNS), weights: WeightSeries=None):
+        self.size = 0
+        self.num_sensors = num_sensors
+        self.weights = weights
+        self.timestamps = np.empty(capacity, dtype=np.int64)
+        self.elapsed = np.empty(capacity, dtype=np.float64)
+        self.sensors = np.empty((capacity, num_sensors), dtype=np.float64)
+
+    @property
+    def capacity(self) -> int:
+        return len(self.timestamps)
+
+    def _reserve(self, needed: int):
+        for name in ('timestamps', 'elapsed', 'sensors'):
+            setattr(self, name, grow(getattr(self, name), self.size, needed))
+
+    def append(self, timestamp_ns: int, elapsed: float, sensors):
+        self._reserve(self.size + 1)
+        i = self.size
+        self.timestamps[i] = timestamp_ns
+        self.elapsed[i] = elapsed
+        self.sensors[i] = sensors
+        self.size += 1
+
+    def extend(self, timestamps_ns, elapsed, sensors):
+        """Appends a whole batch at once. `sensors` is an (n, num_sensors) array."""
+        n = len(timestamps_ns)
+        self._reserve(self.size + n)
+        end = self.size + n
+        self.timestamps[self.size:end] = timestamps_ns
+        self.elapsed[self.size:end] = elapsed
+        self.sensors[self.size:end] = sensors
+        self.size = end
+
+    def clear(self):
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def weight_column(self) -> np.ndarray:
+        if self.weights is None:
+            return np.zeros(self.size)
+        return self.weights.asof(self.timestamps[:self.size])
+
+    def column(self, name: str) -> np.ndarray:
+        """Returns a view of the filled part of a column, by CSV column name ("Current Weight" is computed, not a view)."""
+        if name == 'Timestamp':
+            return self.timestamps[:self.size]
+        if name == 'Elapsed':
+            return self.elapsed[:self.size]
+        if name == 'Current Weight':
+            return self.weight_column()
+        return self.sensors[:self.size, SENSOR_COLUMNS.index(name)]
+
+    def _row(self, i: int, weight: float) -> dict:
+        row = {
+            'Timestamp': ns_to_isoformat(self.timestamps[i]),
+            'Elapsed': float(self.elapsed[i]),
+            'Current Weight': float(weight),
+        }
+        for j, name in enumerate(SENSOR_COLUMNS[:self.num_sensors]):
+            row[name] = float(self.sensors[i, j])
+        return row
+
+    def row(self, i: int) -> dict:
+        if i < 0:
+            i += self.size
+        if not 0 <= i < self.size:
+            raise IndexError("sample index out of range")
+        weight = self.weights.asof(self.timestamps[i:i + 1])[0] if self.weights is not None else 0.0
+        return self._row(i, weight)
+
+    def __getitem__(self, i: int) -> dict:
+        return self.row(i)
+
+    def __iter__(self):
+        weight = self.weight_column()
+        for i in range(self.size):
+            yield self._row(i, weight[i])
+
+    def to_dataframe(self):
+        import pandas as pd
+        data = {'Timestamp': pd.to_datetime(self.timestamps[:self.size], unit='ns', utc=True)}
+        for name in SAMPLE_COLUMNS[1:3 + self.num_sensors]:
+            data[name] = self.column(name)
+        return pd.DataFrame(data)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes currently allocated for all columns (including unused capacity)."""
+        return self.timestamps.nbytes + self.elapsed.nbytes + self.sensors.nbytes
+
+    def bytes_per_sample(self) -> float:
+        """Measured memory cost per stored sample, including the slack from growing by doubling."""
+        if self.size == 0:
+            return 0.0
+        return self.nbytes / self.size
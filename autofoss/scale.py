@@ -1,19 +1,13 @@
 import serial
 from serial.tools import list_ports
-import datetime
+import os
 import re
+import time
 import string
 import threading
 import traceback
 from component import AutofossComponent, ComponentManager
-
-def remove_all(s, chars):
-    for c in chars:
-        s = s.replace(c, "")
-    return s
-
-def filter_printable(s):
-    return ''.join(filter(lambda x: x in string.printable, s))
+from samplestore import WeightSeries
 
 # HACK: extra charmap to fix the encoding issues with the scale
 extra_charmap = {
@@ -30,21 +24,45 @@ extra_charmap = {
     b"\xb9": b"\x39", # 9
 }
 
-def decode_ascii_with_extra(data: bytes) -> str:
-    # HACK: really stupid way to layer the extra encoding... but it works and minimizes the error rate
-    dot_point = data.find(b".")
-    if dot_point < 3:
-        return ""
-    for char in extra_charmap:
-        data = data.replace(char, extra_charmap[char])
-    return data.decode("ascii", errors="ignore")
+# one translate() call maps the extra charmap and drops everything that isn't printable (plus line breaks) - note that
+# bytes.translate() checks `delete` against the *original* bytes, so the mapped high bytes must not be in it
+SCALE_TABLE = bytes.maketrans(b"".join(extra_charmap.keys()), b"".join(extra_charmap.values()))
+SCALE_DELETE = bytes(b for b in range(256)
+                     if bytes([b]) not in extra_charmap and (b >= 0x80 or chr(b) not in string.printable or b in b"\r\n"))
+
+class ScaleParser:
+    """
+    Incremental parser for the scale's continuous output.
+
+    Each chunk is translated once and scanned with a single compiled regex; only the unconsumed tail (a partial reading)
+    is kept between calls. `feed()` returns every reading found in the chunk, so none are lost when a chunk holds several.
+    """
+    pattern = re.compile(rb'(\d{1,3}\.\d{2})l')
+    max_tail = 64 # a reading is only ~10 bytes, anything longer than this without a match is garbage
+
+    def __init__(self):
+        self.tail = b""
+
+    def feed(self, data: bytes, arrival_ns: int) -> list:
+        """Returns a list of (arrival_ns, weight) for every complete reading in `data` plus the held-over tail."""
+        buffer = self.tail + data.translate(SCALE_TABLE, SCALE_DELETE)
+        readings = []
+        end = 0
+        for match in self.pattern.finditer(buffer):
+            readings.append((arrival_ns, float(match.group(1))))
+            end = match.end()
+        self.tail = buffer[end:][-self.max_tail:]
+        return readings
+
+    def reset(self):
+        self.tail = b""
 
 class AutofossScale(AutofossComponent):
     def __init__(self, manager: ComponentManager, interactive=True, log_scale=False, default_port="COM7", weight_timeout=8, full_weight=18.0):
         print("Available ports:")
         for port in list_ports.comports():
             print("\t" + port.device)
-        if not default_port in [port.device for port in list_ports.comports()]:
+        if not default_port in [port.device for port in list_ports.comports()] and not os.path.exists(default_port):
             if not interactive:
                 raise ValueError(f"Default port {default_port} not found. Please specify a port.")
             print(f"Default port {default_port} not found. What port should we use?")
@@ -53,49 +71,59 @@ class AutofossScale(AutofossComponent):
         self.ser = serial.Serial(default_port, 9600, timeout=1)
         print("Serial port opened.")
         self.current_weight = 0.0
-        self.last_weight_change = datetime.datetime.now().timestamp()
-        self.buffer = ""
+        self.last_weight_change = time.monotonic()
+        self.parser = ScaleParser()
+        self.weights = WeightSeries() # every reading with its arrival time, independent of the Gator samples
         self.thread_running = True
         self.thread_initialized = False
         self.log = log_scale
-        self.pattern = re.compile(r'\d{1,3}\.\d{2}(?:lb|l)') # compile once, better performance - why wasn't I doing this before??
         self.weight_timeout = weight_timeout
         self.manager = manager
         self.full_weight = full_weight
 
+    def read_chunk(self) -> bytes:
+        # block until at least one byte arrives (or the port timeout expires), then grab whatever else is already waiting
+        data = self.ser.read(1)
+        if data and self.ser.in_waiting:
+            data += self.ser.read(self.ser.in_waiting)
+        return data
+
     def read_scale(self, no_log=False) -> float:
-        r = self.ser.read_all()
-        decoded = filter_printable(decode_ascii_with_extra(r))
-        if decoded.strip() != "":
-            self.buffer += decoded
-            self.buffer = remove_all(self.buffer, "\r\n")
-            matches = self.pattern.findall(self.buffer)
-            if len(matches) > 0:
-                self.buffer = ""
-                weight = float(remove_all(matches[0], "lb"))
-                self.thread_initialized = True
-                if self.current_weight != weight:
-                    self.last_weight_change = datetime.datetime.now().timestamp()
-                self.current_weight = weight
-                if no_log:
-                    return weight
-                if self.log:
-                    print(f"-> {'{:6.2f}'.format(self.current_weight)}lb - {'{:.2f}'.format(self.current_weight/self.full_weight*100)} % total weight")
-                return weight
+        data = self.read_chunk()
+        readings = self.parser.feed(data, time.monotonic_ns()) if data else []
+        if not readings:
+            return self.current_weight
+        self.thread_initialized = True
+        for arrival_ns, weight in readings:
+            self.weights.append(arrival_ns, weight)
+            if self.current_weight != weight:
+                self.last_weight_change = arrival_ns / 1e9
+            self.current_weight = weight
+        if self.log and not no_log:
+            print(f"-> {'{:6.2f}'.format(self.current_weight)}lb - {'{:.2f}'.format(self.current_weight/self.full_weight*100)} % total weight")
         return self.current_weight
 
     def thread(self):
+        try:
+            self.read_loop()
+        finally:
+            self.manager.signal('drain_finished')
+
+    def read_loop(self):
+        # read_scale() blocks on the serial port, so this loop only wakes up when the scale sends something (or the port times out)
+        gator = self.manager.get('gator')
+        started = time.monotonic() # the Gator is already streaming by now - the scale is started after it (requires=('gator',))
         while self.thread_running:
-            gator = self.manager.get('gator')
-            if (datetime.datetime.now() - gator.start_time).total_seconds() > 10:
-                if not gator.last_packet:
-                    print("Gator seems to be disconnected - no packets received in 10 seconds. Stopping...")
-                    self.thread_running = False
-                    self.thread_initialized = False
-                    return
+            now = time.monotonic()
+            if now - started > 10 and not gator.last_packet:
+                # ends the drain like any other exit of the thread, through the 'drain_finished' signalled in thread()
+                print("Gator seems to be disconnected - no packets received in 10 seconds. Stopping...")
+                self.thread_running = False
+                self.thread_initialized = False
+                return
             try:
-                if gator.auto_end and datetime.datetime.now().timestamp() - self.last_weight_change > self.weight_timeout:
-                    print(f"Tank seems to be drained - no weight changes in {datetime.datetime.now().timestamp() - self.last_weight_change} seconds, over threshold of {self.weight_timeout} seconds. Stopping...")
+                if gator.auto_end and now - self.last_weight_change > self.weight_timeout:
+                    print(f"Tank seems to be drained - no weight changes in {now - self.last_weight_change} seconds, over threshold of {self.weight_timeout} seconds. Stopping...")
                     self.thread_running = False
                     self.thread_initialized = False
                     return
@@ -107,6 +135,7 @@ class AutofossScale(AutofossComponent):
     def start(self):
         self.thread_initialized = False
         self.thread_running = True
+        self.manager.clear('drain_finished')
         self.t = threading.Thread(target=self.thread)
         self.t.start()
     
@@ -117,9 +146,10 @@ class AutofossScale(AutofossComponent):
     def reset(self):
         self.thread_initialized = False
         self.thread_running = False
-        self.buffer = ""
+        self.parser.reset()
+        self.weights = WeightSeries()
         self.current_weight = 0.0
-        self.last_weight_change = datetime.datetime.now().timestamp()
+        self.last_weight_change = time.monotonic()
     
     def wait_for_thread(self):
         # returns bool, bool - graceful stop, force stop
@@ -127,14 +157,12 @@ class AutofossScale(AutofossComponent):
         # if the user interrupts a second time... return the values for a force stop
         try:
             print("Press CTRL+C to stop.")
-            while self.thread_running:
-                pass
+            self.manager.wait_for('drain_finished')
             return False, False
         except KeyboardInterrupt:
             try:
                 print("Interrupted. Shutting down gracefully - press CTRL+C again to force shutdown.")
-                while self.thread_running:
-                    pass
+                self.manager.wait_for('drain_finished')
                 return True, False
             except KeyboardInterrupt:
                 print("Forcing shutdown.")
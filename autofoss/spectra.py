@@ -0,0 +1,49 @@
+"""
+Welch cross-spectra and H1 transfer functions between FOSS tracks, in plain NumPy - shared by the FRF plots
+(plotters/spectral.py) and the real-time estimator (realtime.py), which runs on the acquisition machine without scipy or
+the plotting stack.
+"""
+import numpy as np
+
+def hann(n: int) -> np.ndarray:
+    """The periodic Hann window `signal.get_window('hann', n)` gives, built the same way so the values are identical."""
+    fac = np.linspace(-np.pi, np.pi, n + 1)
+    w = np.zeros(n + 1)
+    w += 0.5 * np.cos(0 * fac)
+    w += 0.5 * np.cos(fac)
+    return w[:-1]
+
+def segment_starts(win_starts, win_len: int, nperseg: int=256, noverlap: int=128) -> np.ndarray:
+    """
+    Start index of every Welch segment in every window, as a (windows, segments) array. Matches the segments
+    `signal.csd`/`signal.welch` would take from each window on its own (trailing samples that don't fill a segment are dropped).
+    """
+    step = nperseg - noverlap
+    n_segments = (win_len - noverlap) // step
+    return np.asarray(win_starts)[:, None] + np.arange(n_segments) * step
+
+def window_ffts(data: np.ndarray, win_starts, win_len: int, nperseg: int=256, noverlap: int=128) -> np.ndarray:
+    """
+    Windowed FFTs of every segment of every track, computed once.
+
+    `data` is a (tracks, samples) array. Each segment is detrended by its mean and multiplied by a periodic Hann window,
+    exactly like `signal.csd`/`signal.welch` do, and the result is a (windows, segments, tracks, freqs) complex array.
+    """
+    starts = segment_starts(win_starts, win_len, nperseg, noverlap)
+    segments = data[:, starts[..., None] + np.arange(nperseg)]  # (tracks, windows, segments, nperseg)
+    segments = segments - segments.mean(axis=-1, keepdims=True)
+    X = np.fft.rfft(segments * hann(nperseg), axis=-1)
+    return X.transpose(1, 2, 0, 3)
+
+def cross_spectra(X: np.ndarray) -> np.ndarray:
+    """
+    Every cross- and auto-spectrum from `window_ffts` output, averaged over segments: S[w, i, j] = mean(conj(X_i) * X_j).
+
+    The density scaling `signal.csd` applies is left out - it cancels in the ratios the FRFs are built from.
+    """
+    return np.einsum('wsif,wsjf->wijf', X.conj(), X) / X.shape[1]
+
+def transfer_functions(S: np.ndarray) -> np.ndarray:
+    """H1 estimate for every track pair: H[w, i, j] = S[w, i, j] / S[w, i, i], the same as `tfestimate(track i, track j)`."""
+    auto = np.einsum('wiif->wif', S)
+    return S / auto[:, :, None, :]
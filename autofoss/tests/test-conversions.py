@@ -0,0 +1,75 @@
+"""
+Checks the array conversions (conversions.py) against the formulas they replace, and times arithmetic against a
+2^18-entry lookup table for CoG -> wavelength.
+
+- cog_to_wavelength must match the scalar cog.py formula for every one of the 2^18 CoG values, in float64, and the
+  correctly rounded float32 value (a float32 LUT built from the float64 one),
+- cog_from_strings must match int(s, 2), unpack_cog must match the bit layout written out by hand,
+- wavelength_to_microstrain must match the old track_to_microstrain expression bit for bit.
+Run with `python tests/test-conversions.py [rows]` from the autofoss directory.
+"""
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from conversions import (unpack_cog, cog_from_strings, cog_to_wavelength, wavelength_to_microstrain, cog_to_microstrain,
+                         COG_RANGE, NUM_SENSORS)
+
+def scalar_cog_to_wavelength(binary):
+    # old/common/cog.py
+    return 1514+((int(binary, 2) * (1586-1514))/(2 ** 18))
+
+def timed(f, repeat: int=3) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2000000
+    rng = np.random.default_rng(0)
+    every_cog = np.arange(COG_RANGE)
+
+    lut64 = np.array([scalar_cog_to_wavelength(format(c, '018b')) for c in range(COG_RANGE)])
+    lut32 = lut64.astype(np.float32)
+    assert np.array_equal(cog_to_wavelength(every_cog), lut64)
+    assert np.array_equal(cog_to_wavelength(every_cog, np.float32), lut32)
+    print("cog_to_wavelength matches the scalar formula for all 2^18 CoG values (float64 and float32)")
+
+    strings = np.array([format(c, '018b') for c in rng.integers(0, COG_RANGE, 10000)])
+    assert np.array_equal(cog_from_strings(strings), [int(s, 2) for s in strings])
+    assert np.array_equal(cog_from_strings(np.array(["101", "0b11"])), [5, 3])
+    print("cog_from_strings matches int(s, 2)")
+
+    cog_data = rng.integers(0, 256, (1000, 24), dtype=np.uint8)
+    bits = np.unpackbits(cog_data, axis=1)
+    cog, err = unpack_cog(cog_data)
+    for k in range(NUM_SENSORS):
+        expected = bits[:, 19 * k:19 * k + 18].astype(np.int64) @ (1 << np.arange(17, -1, -1))
+        assert np.array_equal(cog[:, k], expected) and np.array_equal(err[:, k], bits[:, 19 * k + 18])
+    assert np.array_equal(unpack_cog(cog_data.tobytes())[0], cog)
+    print("unpack_cog matches the packet bit layout")
+
+    wavelengths = cog_to_wavelength(rng.integers(0, COG_RANGE, (1000, NUM_SENSORS)))
+    old = (wavelengths - wavelengths[0]) / wavelengths[0] * (1 / (1 - 0.22)) * 1e6
+    assert np.array_equal(wavelength_to_microstrain(wavelengths), old)
+    print("wavelength_to_microstrain matches track_to_microstrain's expression")
+
+    cog = rng.integers(0, COG_RANGE, (rows, NUM_SENSORS)).astype(np.uint32)
+    direct = cog_to_microstrain(cog)
+    via_wavelengths = wavelength_to_microstrain(cog_to_wavelength(cog))
+    print(f"cog_to_microstrain vs via wavelengths: max difference {np.max(np.abs(direct - via_wavelengths)):.3g} microstrain")
+
+    print(f"\n{rows} x {NUM_SENSORS} CoG values -> wavelengths, best of 3:")
+    for name, dtype, lut in (("float64", np.float64, lut64), ("float32", np.float32, lut32)):
+        arithmetic = timed(lambda: cog_to_wavelength(cog, dtype))
+        lookup = timed(lambda: lut[cog])
+        print(f"  {name}: arithmetic {arithmetic:.3f} s, LUT {lookup:.3f} s")
+
+if __name__ == '__main__':
+    main()
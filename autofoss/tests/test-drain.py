@@ -0,0 +1,90 @@
+"""
+Checks the lazy drain reader (plotters.drain) against loading the whole drain, and times it.
+
+Writes a synthetic drain as CSV (the streaming writer's format) and as NPZ, then for each one:
+- checks that frame() is the same DataFrame load_recording gives, and that columns() / slice() / rows() give the same
+  values as picking them out of it,
+- times opening it, building (and then reusing) the CSV row-offset index, reading two columns, and slicing 1 s of data.
+Run with `python tests/test-drain.py [minutes]` from the autofoss directory.
+"""
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from samplestore import SampleStore, WeightSeries
+from csv_util import format_rows
+from npz_util import write_npz
+from plotters.recording import load_recording
+from plotters.drain import open_drain, INDEX_BLOCK
+
+FS = 19320
+CHUNK = 100000
+
+def synthetic_drain(minutes: float) -> SampleStore:
+    rng = np.random.default_rng(0)
+    n = int(minutes * 60 * FS)
+    start_ns = 1700000000 * 10**9
+    weights = WeightSeries()
+    weights.epoch_offset_ns = 0
+    for i in range(int(minutes * 60 * 10)):
+        weights.append(start_ns + i * 10**8, 100.0 - i * 0.01)
+    samples = SampleStore(capacity=n, weights=weights)
+    elapsed = np.arange(n) / FS
+    samples.extend(start_ns + (elapsed * 1e9).astype(np.int64), elapsed, 1550 + rng.standard_normal((n, 8)) * 0.01)
+    return samples
+
+def write_csv_drain(samples: SampleStore, path: str):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write(','.join(['Timestamp', 'Elapsed', 'Current Weight'] + [f'Sensor {i}' for i in range(1, 9)]) + '\r\n')
+        weight = samples.weight_column()
+        for i in range(0, len(samples), CHUNK):
+            f.write(format_rows(samples.timestamps[i:i + CHUNK], samples.elapsed[i:i + CHUNK], weight[i:i + CHUNK], samples.sensors[i:i + CHUNK]))
+
+def timed(f):
+    start = time.perf_counter()
+    result = f()
+    return result, time.perf_counter() - start
+
+def check(path: str):
+    print(f"{os.path.basename(path)}: {os.path.getsize(path) / 1024**2:.0f} MB")
+    full = load_recording(path)
+
+    drain, t_open = timed(lambda: open_drain(path))
+    print(f"  open: {t_open * 1000:.1f} ms")
+    if hasattr(drain, 'index'):
+        _, t_index = timed(drain.index)
+        _, t_reopen = timed(lambda: open_drain(path).index())
+        print(f"  row-offset index: built in {t_index:.2f} s, reloaded in {t_reopen * 1000:.1f} ms")
+
+    t0 = len(full) / FS / 2
+    part, t_slice = timed(lambda: open_drain(path).slice(t0, t0 + 1, ["Elapsed", "Sensor 1"]))
+    expected = full.loc[(full["Elapsed"] >= t0) & (full["Elapsed"] < t0 + 1), ["Elapsed", "Sensor 1"]]
+    pd.testing.assert_frame_equal(part, expected, check_index_type=False)
+    print(f"  slice of 1 s (2 columns, cold): {t_slice * 1000:.1f} ms")
+
+    two, t_columns = timed(lambda: drain.columns(["Elapsed", "Current Weight"]))
+    pd.testing.assert_frame_equal(two, full[["Elapsed", "Current Weight"]])
+    print(f"  columns Elapsed + Current Weight: {t_columns:.2f} s")
+
+    start = INDEX_BLOCK + 123
+    pd.testing.assert_frame_equal(open_drain(path).rows(start, start + 5000), full.iloc[start:start + 5000], check_index_type=False)
+    pd.testing.assert_frame_equal(drain.slice(t0, t0 + 1), full[(full["Elapsed"] >= t0) & (full["Elapsed"] < t0 + 1)], check_index_type=False)
+    pd.testing.assert_frame_equal(drain.frame(), full)
+    print("  same values as load_recording")
+
+def main():
+    minutes = float(sys.argv[1]) if len(sys.argv) > 1 else 2
+    samples = synthetic_drain(minutes)
+    with tempfile.TemporaryDirectory() as folder:
+        csv_path = os.path.join(folder, "drain.csv")
+        write_csv_drain(samples, csv_path)
+        check(csv_path)
+        check(write_npz(samples, out_folder=folder, fmt="drain.npz"))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmarks level-of-detail plotting (lod) on a drain-length series and checks that it looks like the full data.
+
+- builds the pyramid for a 30-minute, 19.32 kHz column and times a full redraw (query + Agg draw) at a range of zoom
+  levels, against drawing every sample for the same views,
+- renders a shorter series both ways (default line width, without antialiasing) and counts the pixels that differ - only
+  a handful should, where the stroke of a sample the decimation left out spills over a column edge.
+Run with `python tests/test-lod-bench.py [minutes]` from the autofoss directory.
+"""
+import os
+import sys
+import time
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lod import MinMaxPyramid, LODLine
+
+FS = 19320
+VIEWS = [None, 600, 60, 5, 0.05] # seconds visible
+
+def series(minutes: float) -> tuple:
+    rng = np.random.default_rng(0)
+    n = int(minutes * 60 * FS)
+    return np.arange(n) / FS, np.cumsum(rng.standard_normal(n)) * 0.01 + rng.standard_normal(n) * 0.1
+
+def redraw_time(fig, ax, span, duration: float, repeat: int=3) -> float:
+    center = duration / 2
+    best = float('inf')
+    for i in range(repeat):
+        start = time.perf_counter()
+        # a slightly different view each time, like panning
+        x0 = 0 if span is None else center - span / 2 + i * (span or 0) / 10
+        ax.set_xlim(x0, duration if span is None else x0 + span)
+        fig.canvas.draw()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def rendered(x, y, lod: bool) -> np.ndarray:
+    fig, ax = plt.subplots(figsize=(8, 4), dpi=100)
+    with matplotlib.rc_context({'path.simplify': False, 'agg.path.chunksize': 0}):
+        if lod:
+            line = LODLine(ax, x, y, antialiased=False)
+        else:
+            ax.plot(x, y, antialiased=False)
+        ax.set_xlim(x[0], x[-1])
+        ax.set_ylim(y.min(), y.max())
+        ax.set_axis_off()
+        fig.canvas.draw()
+    image = np.asarray(fig.canvas.buffer_rgba()).copy()
+    plt.close(fig)
+    return image
+
+def main():
+    minutes = float(sys.argv[1]) if len(sys.argv) > 1 else 30
+    x, y = series(minutes)
+    duration = x[-1]
+    print(f"{len(y):,} samples ({minutes} minutes at {FS} Hz)")
+
+    start = time.perf_counter()
+    pyramid = MinMaxPyramid(y, x)
+    print(f"pyramid built in {time.perf_counter() - start:.2f} s, {len(pyramid.levels)} levels")
+
+    fig, ax = plt.subplots(figsize=(12, 6), dpi=100)
+    line = LODLine(ax, None, pyramid)
+    fig_full, ax_full = plt.subplots(figsize=(12, 6), dpi=100)
+    ax_full.plot(x, y)
+    print("\nredraw (set_xlim + draw), best of 3:")
+    for span in VIEWS:
+        lod = redraw_time(fig, ax, span, duration)
+        full = redraw_time(fig_full, ax_full, span, duration, repeat=1)
+        print(f"  {'all' if span is None else f'{span} s':>8}: {lod * 1000:7.1f} ms with LOD ({len(line.line.get_xdata()):6d} points), {full * 1000:8.1f} ms with every sample")
+
+    x, y = x[:2000000], y[:2000000]
+    full, decimated = rendered(x, y, False), rendered(x, y, True)
+    differing = np.count_nonzero(np.any(full != decimated, axis=2))
+    print(f"\n{len(y):,} samples rendered both ways: {differing} of {full.shape[0] * full.shape[1]} pixels differ")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Replays a recorded drain through the real-time FRF estimator, the way the Gator callback would feed it, and reports the CPU
+time spent per 0.2 s window against the time budget. At the end the running average is checked against the offline FRF grid.
+
+Run with `python tests/test-realtime-replay.py [drain.csv|drain.npz] [--paced]` from the autofoss directory. Without a
+drain, one minute of synthetic data is used. By default the file is fed as fast as the estimator can take it; with --paced,
+batches are fed at the Gator's real rate and windows are dropped if the estimator can't keep up, like during a drain.
+"""
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from realtime import StreamingFRFEstimator
+from samplestore import SENSOR_COLUMNS, WeightSeries
+from plotters import load_recording
+from plotters.libplotter import track_to_microstrain
+from plotters.spectral import frf_grid
+
+SAMPLE_RATE = 19320 # same as gator.SAMPLE_RATE - importing gator needs the Gator API, which replaying doesn't
+BATCH = 200 # samples per Gator callback, roughly
+
+def load(path: str):
+    if path is None:
+        rng = np.random.default_rng(0)
+        n = 60 * SAMPLE_RATE
+        sensors = 1550 + np.cumsum(rng.standard_normal((n, 1)), axis=0) * 1e-5 + rng.standard_normal((n, len(SENSOR_COLUMNS))) * 1e-3
+        weight = np.linspace(15.45, 1.0, n)
+    else:
+        df = load_recording(path)
+        sensors = df[SENSOR_COLUMNS].to_numpy(dtype=np.float64)
+        weight = df['Current Weight'].to_numpy(dtype=np.float64)
+    timestamps = time.time_ns() + (np.arange(len(sensors)) * (1e9 / SAMPLE_RATE)).astype(np.int64)
+    return timestamps, sensors, weight
+
+def main(path: str=None, paced: bool=False):
+    timestamps, sensors, weight = load(path)
+    print(f"Replaying {len(sensors)} samples ({len(sensors) / SAMPLE_RATE:.1f}s of data){' at the Gator rate' if paced else ''}...")
+    weights = WeightSeries()
+    # one scale reading per Gator batch is already more than the scale sends
+    for i in range(0, len(weight), BATCH):
+        weights.append(timestamps[i] - weights.epoch_offset_ns, weight[i])
+
+    estimator = StreamingFRFEstimator(SAMPLE_RATE, drop_when_behind=paced).start(weights)
+    started = time.monotonic()
+    for i in range(0, len(sensors), BATCH):
+        estimator.feed(timestamps[i:i + BATCH], sensors[i:i + BATCH])
+        if paced:
+            delay = started + (i + BATCH) / SAMPLE_RATE - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+    estimator.stop()
+    print(f"Done in {time.monotonic() - started:.1f}s: {estimator.cpu_summary()}")
+    latest = estimator.latest
+    print(f"Last window: #{latest['window']}, weight {latest['weight']:.2f} lbs")
+
+    if estimator.dropped:
+        print("Windows were dropped, so the running average can't be compared with the offline FRFs.")
+        return
+    tracks = np.stack([track_to_microstrain(pd.Series(sensors[:, i])).to_numpy() for i in estimator.tracks])
+    n_windows = len(sensors) // estimator.win_len
+    _, H_avg, _ = frf_grid(tracks, SAMPLE_RATE, 0, n_windows, estimator.win_len)
+    off_diagonal = ~np.eye(len(estimator.tracks), dtype=bool)
+    error = np.max(np.abs(latest['H_avg'] - H_avg)[off_diagonal] / np.abs(H_avg)[off_diagonal])
+    print(f"Largest relative difference from the offline FRF grid: {error:.2e}")
+
+if __name__ == '__main__':
+    args = [arg for arg in sys.argv[1:] if arg != '--paced']
+    main(args[0] if args else None, '--paced' in sys.argv)
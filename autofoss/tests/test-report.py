@@ -0,0 +1,65 @@
+"""
+Checks that report.py renders a folder of drains correctly when it holds more than just one drain per name.
+
+Writes a short synthetic drain as both drain.csv and drain.npz into one folder and builds the CSV's row-offset index
+(drain.csv.idx.npz) next to it, then:
+- checks that find_drains picks up the two drains but not the index, and that they get different figure names,
+- runs report.py on the folder and checks that it succeeds and writes one figure per drain.
+Run with `python tests/test-report.py` from the autofoss directory.
+"""
+import os
+import sys
+import subprocess
+import tempfile
+import numpy as np
+
+AUTOFOSS = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, AUTOFOSS)
+
+import report
+from samplestore import SampleStore, WeightSeries
+from csv_util import format_rows
+from npz_util import write_npz
+from plotters.drain import open_drain
+
+FS = 19320
+
+def synthetic_drain(seconds: float) -> SampleStore:
+    rng = np.random.default_rng(0)
+    n = int(seconds * FS)
+    start_ns = 1700000000 * 10**9
+    weights = WeightSeries()
+    weights.epoch_offset_ns = 0
+    for i in range(int(seconds * 10)):
+        weights.append(start_ns + i * 10**8, 100.0 - i * 0.01)
+    samples = SampleStore(capacity=n, weights=weights)
+    elapsed = np.arange(n) / FS
+    samples.extend(start_ns + (elapsed * 1e9).astype(np.int64), elapsed, 1550 + rng.standard_normal((n, 8)) * 0.01)
+    return samples
+
+def main():
+    samples = synthetic_drain(5)
+    with tempfile.TemporaryDirectory() as folder:
+        csv_path = os.path.join(folder, "drain.csv")
+        with open(csv_path, 'w', encoding='utf-8', newline='') as f:
+            f.write(','.join(['Timestamp', 'Elapsed', 'Current Weight'] + [f'Sensor {i}' for i in range(1, 9)]) + '\r\n')
+            f.write(format_rows(samples.timestamps, samples.elapsed, samples.weight_column(), samples.sensors))
+        npz_path = write_npz(samples, out_folder=folder, fmt="drain.npz")
+        open_drain(csv_path).slice(1, 2) # builds and saves the row-offset index
+        assert os.path.isfile(csv_path + '.idx.npz')
+
+        drains = report.find_drains([folder])
+        assert drains == sorted([csv_path, npz_path]), drains
+        assert report.find_drains([os.path.join(folder, '*.npz')]) == [npz_path]
+        out_dir = os.path.join(folder, "reports")
+        outputs = {report.output_path(out_dir, drain, 'weight-over-time', {}, 'png') for drain in drains}
+        assert len(outputs) == 2, outputs
+        print("find_drains skips the index, and drain.csv / drain.npz get their own figures")
+
+        run = subprocess.run([sys.executable, "report.py", folder, "-p", "weight-over-time", "-o", out_dir], cwd=AUTOFOSS, capture_output=True, text=True)
+        assert run.returncode == 0, run.stdout + run.stderr
+        assert sorted(os.listdir(out_dir)) == sorted(os.path.basename(path) for path in outputs), os.listdir(out_dir)
+        print(f"report.py rendered the folder: {', '.join(sorted(os.listdir(out_dir)))}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmarks the CPU use of the scale thread against a fake scale on a pseudo-terminal (Linux/macOS only).
+
+A background thread writes readings to the pty master in the same format (and with the same high-bit digits) as the
+SBI-240 in continuous mode, and AutofossScale reads them from the slave end like it would from the real serial port.
+Run with `python tests/test-scale-pty.py [seconds]` from the autofoss directory.
+"""
+import os
+import sys
+import pty
+import time
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from component import ComponentManager
+from scale import AutofossScale
+
+FRAME_RATE = 10 # readings per second
+
+class FakeGator:
+    auto_end = False
+    last_packet = True
+
+def encode_reading(weight: float) -> bytes:
+    # digits and spaces come through with the high bit set, just like the real scale
+    text = f"{weight:7.2f}".encode("ascii")
+    return bytes(c | 0x80 if c in b"0123456789 " else c for c in text) + b"lb\r\n"
+
+def fake_scale(master: int, stop: threading.Event):
+    weight = 15.45
+    while not stop.is_set():
+        os.write(master, encode_reading(weight))
+        weight = max(weight - 0.01, 0)
+        time.sleep(1 / FRAME_RATE)
+
+def measure(target, duration: float) -> float:
+    # the main thread just sleeps, so process CPU time is (almost) entirely the scale thread
+    cpu_start, wall_start = time.process_time(), time.monotonic()
+    target(duration)
+    return (time.process_time() - cpu_start) / (time.monotonic() - wall_start) * 100
+
+def main(duration: float=10.0):
+    master, slave = pty.openpty()
+    port = os.ttyname(slave)
+    stop = threading.Event()
+    threading.Thread(target=fake_scale, args=(master, stop), daemon=True).start()
+
+    manager = ComponentManager()
+    manager.add('gator', FakeGator())
+    scale = AutofossScale(manager, interactive=False, log_scale=False, default_port=port)
+    manager.add('scale', scale)
+    readings = []
+
+    def run_event_driven(duration):
+        scale.start()
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            time.sleep(0.1)
+            readings.append(scale.current_weight)
+        scale.stop()
+
+    def run_busy_poll(duration):
+        # what the scale thread used to do: spin on read_all() without ever blocking
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            scale.ser.read_all()
+
+    cpu = measure(run_event_driven, duration)
+    print(f"Event-driven reader: {cpu:.1f}% of one core, last weight {scale.current_weight} lb, initialized: {scale.thread_initialized}")
+    cpu = measure(run_busy_poll, duration)
+    print(f"Busy-polling read_all(): {cpu:.1f}% of one core")
+    stop.set()
+
+if __name__ == '__main__':
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 10.0)
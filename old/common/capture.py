@@ -0,0 +1,90 @@
+"""
+Loading and reshaping of unofficial FOSS captures (fossfetch's packet,timestamp,sensor,cog,err CSV), shared by
+converter.py and fossgraphermpg.py.
+
+Both scripts used to group the rows by timestamp with one np.where per unique timestamp and convert every CoG in Python
+loops. `pivot_capture` gives the same table in a few array passes:
+- the file is read by pandas in chunks and each text column is factorized, so every distinct timestamp, sensor name and
+  CoG string is kept once and every row becomes an integer code,
+- the codes are the grouping (timestamps sorted as strings, like np.unique on the text column did),
+- sensors are scattered into columns in one assignment, keeping the last row for each timestamp and sensor,
+- the CoG -> wavelength conversion runs once per distinct CoG string, not once per row.
+"""
+import numpy as np
+import pandas as pd
+from common.cog import conversions, cog_from_strings
+
+CHUNK_ROWS = 2000000
+
+class _Factorizer:
+    """Integer codes for the values of a column read in chunks, without keeping the strings of every row."""
+    def __init__(self):
+        self.uniques = pd.Index([], dtype=object)
+        self.codes = []
+
+    def add(self, values: pd.Series):
+        codes, uniques = pd.factorize(values)
+        positions = self.uniques.get_indexer(uniques)
+        new = positions < 0
+        positions[new] = len(self.uniques) + np.arange(np.count_nonzero(new))
+        self.uniques = self.uniques.append(pd.Index(uniques[new], dtype=object))
+        self.codes.append(positions[codes].astype(np.int32))
+
+    def sorted_codes(self) -> tuple:
+        """The distinct values in string order, and each row's index into them."""
+        values = np.array(self.uniques, dtype=str)
+        order = np.argsort(values, kind='stable')
+        rank = np.empty(len(order), dtype=np.int32)
+        rank[order] = np.arange(len(order))
+        codes = np.concatenate(self.codes) if self.codes else np.zeros(0, dtype=np.int32)
+        return values[order], rank[codes]
+
+def read_capture(path: str, skip_header: int=3) -> tuple:
+    """
+    Reads the timestamp, sensor and cog columns of a capture, returning (distinct values, per-row codes) for each.
+    `skip_header` counts lines, like np.genfromtxt's - the scripts have always skipped 3 (the header and the first two rows).
+    """
+    columns = [_Factorizer() for _ in range(3)]
+    for chunk in pd.read_csv(path, delimiter=',', header=None, skiprows=skip_header, usecols=[1, 2, 3], dtype=str,
+                             keep_default_na=False, na_filter=False, skip_blank_lines=True, chunksize=CHUNK_ROWS):
+        for factorizer, column in zip(columns, (1, 2, 3)):
+            factorizer.add(chunk[column])
+    return tuple(factorizer.sorted_codes() for factorizer in columns)
+
+def pivot_capture(path: str, n_sensors: int=8, skip_header: int=3) -> tuple:
+    """
+    One row per packet (unique timestamp, in string order), as the scripts built it: returns (timestamps as floats,
+    (packets, n_sensors) wavelengths for sensors 1..n_sensors, with 0 where a packet has no row for that sensor).
+    Timestamps that don't parse as floats are left out, like the scripts skipped them.
+    """
+    (timestamps, timestamp_codes), (sensor_names, sensor_codes), (cogs, cog_codes) = read_capture(path, skip_header)
+
+    # "sensor_01" -> 1, once per distinct name
+    sensor_numbers = np.array([int(name.split("_")[1]) for name in sensor_names], dtype=np.int64)[sensor_codes]
+    rows = np.flatnonzero((sensor_numbers >= 1) & (sensor_numbers <= n_sensors))
+    # the last row for each (timestamp, sensor) wins: the first occurrence of each key, counting from the end
+    keys = timestamp_codes[rows].astype(np.int64) * n_sensors + (sensor_numbers[rows] - 1)
+    _, last = np.unique(keys[::-1], return_index=True)
+    rows = rows[len(rows) - 1 - last]
+
+    # convert only the CoG strings that end up in the table
+    used, inverse = np.unique(cog_codes[rows], return_inverse=True)
+    wavelengths = conversions.cog_to_wavelength(cog_from_strings(cogs[used]))[inverse]
+
+    table = np.zeros((len(timestamps), n_sensors))
+    table[timestamp_codes[rows], sensor_numbers[rows] - 1] = wavelengths
+
+    # numpy's own string -> float conversion, which is what storing the strings into the float table used to do
+    try:
+        return timestamps.astype(np.float64), table
+    except ValueError:
+        pass
+    values = np.zeros(len(timestamps))
+    valid = np.zeros(len(timestamps), dtype=bool)
+    for i, timestamp in enumerate(timestamps):
+        try:
+            values[i] = timestamp
+            valid[i] = True
+        except ValueError:
+            pass
+    return values[valid], table[valid]
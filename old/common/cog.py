@@ -1,6 +1,16 @@
 """
 helper functions for decoding CoG data
+
+The whole-array versions (CoG bytes/bit strings -> wavelengths -> microstrain) live in autofoss/conversions.py and are
+re-exported here; conversions.cog_to_wavelength is the array counterpart of cog_to_wavelength below.
 """
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "autofoss"))
+
+import conversions
+from conversions import unpack_cog, cog_from_strings, api_to_wavelength, wavelength_to_microstrain, cog_to_microstrain, STRAIN_FACTOR
 
 def cog_to_wavelength(binary):
     return 1514+((int(binary, 2) * (1586-1514))/(2 ** 18))
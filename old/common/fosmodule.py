@@ -2,13 +2,102 @@
 Written by Caleb C. in 2022 for Carthage Space Sciences | WSGC | NASA
 Module to contain classes for mpg-foss.
 """
+import numpy as np
+from common.cog import unpack_cog
+
+#Layout of one 43-byte Gator packet (see gatorpacket): 16-byte header, 3-byte status word, 24 bytes of CoG data.
+PACKET_LEN = 43
+NUM_SENSORS = 8
+SYNC = b'ohoy'
+SYNC_OFFSET = 12 #Position of the sync word in the packet.
+PAYLOAD_LEN = PACKET_LEN - 16 #What the payload length field says - everything after the header.
+packet_dtype = np.dtype([
+    ('payload_len', '>u4'),
+    ('timestamp', '>f4'),
+    ('packet_num', '>u2'),
+    ('gator_type', 'u1'),
+    ('version', 'u1'),
+    ('sync', 'S4'),
+    ('status', 'u1', (3,)),
+    ('cog_data', 'u1', (24,)),
+])
+assert packet_dtype.itemsize == PACKET_LEN
+
+def decode_packets(data) -> dict:
+    """
+    Decodes a buffer of back-to-back 43-byte packets (bytes, bytearray, memoryview, a uint8 array or the (N, 43) array
+    from datahelper.feed) all at once.
+    Gives the same values as gatorpacket for every packet, as arrays with one row per packet:
+    payload_len, timestamp, packet_num, gator_type, version, sync_ok (the sync word is 'ohoy'),
+    status (the 24-bit status word), cog ((N, 8) 18-bit CoG values) and err ((N, 8) error bits).
+    """
+    if isinstance(data, np.ndarray) and data.dtype == packet_dtype:
+        packets = data
+    elif isinstance(data, np.ndarray) and data.ndim == 2:
+        #(N, 43) rows from datahelper.feed - only copied if they aren't already laid out back to back
+        packets = np.ascontiguousarray(data, dtype=np.uint8).reshape(-1).view(packet_dtype)
+    else:
+        raw = np.frombuffer(data, dtype=np.uint8)
+        if len(raw) % PACKET_LEN:
+            raise ValueError(f"Buffer length {len(raw)} is not a multiple of the {PACKET_LEN}-byte packet length.")
+        packets = raw.view(packet_dtype)
+    status = packets['status'].astype(np.uint32)
+    cog, err = unpack_cog(packets['cog_data'])
+    return {
+        'payload_len': packets['payload_len'].astype(np.uint32),
+        'timestamp': packets['timestamp'].astype(np.float32),
+        'packet_num': packets['packet_num'].astype(np.uint16),
+        'gator_type': packets['gator_type'].copy(),
+        'version': packets['version'].copy(),
+        'sync_ok': packets['sync'] == b'ohoy',
+        'status': (status[:, 0] << 16) | (status[:, 1] << 8) | status[:, 2],
+        'cog': cog,
+        'err': err,
+    }
+
+_half_bit_strings = np.array([format(i, '09b') for i in range(512)])
+
+def cog_strings(cog: np.ndarray) -> np.ndarray:
+    """18-character bit strings for CoG values, as gatorpacket.data.get_cog_data gives them."""
+    cog = np.asarray(cog)
+    return np.char.add(_half_bit_strings[cog >> 9], _half_bit_strings[cog & 0x1FF])
+
+def find_sync(buffer, sync: bytes=SYNC) -> np.ndarray:
+    """Offsets of every occurrence of `sync` in `buffer`, found with array comparisons instead of a regex."""
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    hits = np.flatnonzero(data[:max(len(data) - len(sync) + 1, 0)] == sync[0])
+    for i in range(1, len(sync)):
+        hits = hits[data[hits + i] == sync[i]]
+    return hits
 
 class datahelper:
-    import re
-    def __init__(self):
+    """
+    Finds packets in raw Gator data.
+
+    sort()/parse() work on one buffer (raw_data) and give copies of every packet. feed() is for streams of USB reads:
+    it finds whole packets in each read with vectorized sync word search, checks their payload length field (unless
+    payload_len is None), and returns them as an (N, 43) uint8 array - a strided view into the read when the packets are
+    back to back, as they normally are. A packet cut off at the end of a read is kept and completed by the next one.
+    The Gator sends each packet byte-reversed ('yoho'), so pass reverse=True for data straight from the device: the
+    packets are then found in the order they arrived and returned as reversed views, which read like normal packets.
+    Counters: packets_found, bad_packets (sync words without a valid packet), discarded (bytes outside any packet),
+    sequence_errors (packet numbers not following on from the previous packet) and missed (packets skipped over).
+    """
+    def __init__(self, reverse: bool=False, payload_len: int=PAYLOAD_LEN):
         self._header_indexes = {}
         self._packets = {}
         self._raw_data: bytearray
+        self.reverse = reverse
+        self.payload_len = payload_len
+        self._sync = SYNC[::-1] if reverse else SYNC
+        self._sync_offset = PACKET_LEN - SYNC_OFFSET - len(SYNC) if reverse else SYNC_OFFSET
+        self._carry = np.zeros(0, dtype=np.uint8)
+        self._last_packet_num = None
+        self.packets_found = 0
+        self.bad_packets = 0
+        self.discarded = 0
+        self.sequence_errors = 0
+        self.missed = 0
 
     @property
     def header_indexes(self):
@@ -33,12 +122,9 @@ class datahelper:
         #Get raw data object
         data = self.raw_data
         if self.raw_data is not None:
-            #Use regex to find all packets.
-            hit_num = 0
             #For reference, yoho(ohoy here, because big endian) is b'\x6f\x68\x6f\x79'
-            for match in self.re.finditer(b'\x6f\x68\x6f\x79',data):
-                self._header_indexes[hit_num] = match.end() - 16 #Subtract 16 to reach beginning of packet.
-                hit_num += 1 #Post increment
+            for hit_num, index in enumerate(find_sync(data)):
+                self._header_indexes[hit_num] = int(index) - SYNC_OFFSET #Go back to the beginning of the packet.
         return self._header_indexes
 
     def parse(self):
@@ -52,6 +138,59 @@ class datahelper:
             packets[key] = self.raw_data[indexes[key]:indexes[key]+43]
         return packets
 
+    #Finds the whole packets in the next read of a stream (see the class docstring). The read is copied into `out` (a
+    #preallocated uint8 array with room for the read plus PACKET_LEN bytes), or a new array, which the packets are views into.
+    def feed(self, data, out: np.ndarray=None) -> np.ndarray:
+        #The only copy: the read goes after the bytes carried over from the last one.
+        size = len(self._carry) + len(data)
+        buffer = out[:size] if out is not None else np.empty(size, dtype=np.uint8)
+        buffer[:len(self._carry)] = self._carry
+        buffer[len(self._carry):] = np.frombuffer(data, dtype=np.uint8)
+        starts = find_sync(buffer, self._sync) - self._sync_offset
+        starts = starts[starts >= 0]
+        complete = starts[starts + PACKET_LEN <= len(buffer)]
+        valid = complete
+        if self.payload_len is not None and len(complete):
+            field = buffer[complete[:, None] + (np.arange(PACKET_LEN - 4, PACKET_LEN)[::-1] if self.reverse else np.arange(4))].astype(np.uint32)
+            valid = complete[((field[:, 0] << 24) | (field[:, 1] << 16) | (field[:, 2] << 8) | field[:, 3]) == self.payload_len]
+        if len(valid) > 1 and np.diff(valid).min() < PACKET_LEN:
+            #A sync word inside another packet's data - keep the first of any overlapping packets.
+            kept = []
+            for start in valid:
+                if not kept or start >= kept[-1] + PACKET_LEN:
+                    kept.append(start)
+            valid = np.array(kept, dtype=starts.dtype)
+        self.bad_packets += len(complete) - len(valid)
+
+        #No overlaps left, so the packets are back to back if they span exactly their own length.
+        if len(valid) and valid[-1] - valid[0] == (len(valid) - 1) * PACKET_LEN:
+            frames = np.lib.stride_tricks.as_strided(buffer[valid[0]:], shape=(len(valid), PACKET_LEN), strides=(PACKET_LEN, 1), writeable=False)
+        else:
+            frames = buffer[valid[:, None] + np.arange(PACKET_LEN)]
+        if self.reverse:
+            frames = frames[:, ::-1]
+
+        #Anything after the last packet could be the start of one that finishes in the next read.
+        end = int(valid[-1]) + PACKET_LEN if len(valid) else 0
+        carry_start = max(end, len(buffer) - (PACKET_LEN - 1))
+        self._carry = buffer[carry_start:].copy()
+        self.discarded += carry_start - len(valid) * PACKET_LEN
+        self.packets_found += len(valid)
+        self._check_sequence(frames)
+        return frames
+
+    def _check_sequence(self, frames: np.ndarray):
+        if not len(frames):
+            return
+        packet_nums = (frames[:, 8].astype(np.int64) << 8) | frames[:, 9]
+        if self._last_packet_num is not None:
+            packet_nums = np.concatenate([[self._last_packet_num], packet_nums])
+        steps = np.diff(packet_nums) % 65536
+        self._last_packet_num = int(packet_nums[-1])
+        self.sequence_errors += int(np.count_nonzero(steps != 1))
+        #Small jumps forward are lost packets, anything else is packets out of order.
+        self.missed += int(np.sum(steps[(steps > 1) & (steps < 32768)] - 1))
+
 class gatorpacket:
     def __init__(self):
         self._raw_data: bytearray
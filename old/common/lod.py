@@ -0,0 +1,9 @@
+"""
+min/max level-of-detail plotting for long captures - re-exported from autofoss/lod.py for the old tools.
+"""
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "autofoss"))
+
+from lod import MinMaxPyramid, LODLine, plot_lod
@@ -6,7 +6,7 @@ currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentfram
 parentdir = os.path.dirname(currentdir)
 sys.path.insert(0, parentdir)
 
-from common.cog import cog_to_wavelength
+from common.capture import pivot_capture
 import argparse
 import numpy as np
 from betterlib.logging import Logger
@@ -24,45 +24,14 @@ logger.info("Input file: " + args.input[0])
 logger.info("Output file: " + args.output[0])
 
 logger.info("Loading data...")
-# load with strings as well, since we need to parse the sensor numbers
-_data = np.genfromtxt(args.input[0], delimiter=',', skip_header=3, dtype=str)
-logger.info("Data loaded.")
-
-# since this is unofficially grabbed data, we need to do some preprocessing to get it into a format similar to the official data
-data = np.zeros((_data.shape[0], 16))
-# find all unique timestamps in the data
-timestamps = np.unique(_data[:, 1])
-logger.info("Found " + str(len(timestamps)) + " unique timestamps.")
-new_packets = []
-# for each timestamp, find all rows that have that timestamp and put them in the right place in the new_packets array
-for timestamp in timestamps:
-    rows = np.where(_data[:, 1] == timestamp)[0]
-    new_packets.append({"timestamp": timestamp})
-    for row in rows:
-        if _data[row, 4] != 1:
-            new_packets[-1]["sensor_0" + str(int(_data[row, 2].split("_")[1]))] = _data[row, 3]
-
-# now we have a list of packets, each with a timestamp and 8 sensor values. we need to put them into the `data` array
-i = 0
-for packet in new_packets:
-    try:
-        data[i, 0] = packet["timestamp"]
-    except ValueError:
-        # missing timestamp, skip this packet
-        continue
-    for j in range(8):
-        try:
-            # data[i, j+8] = str(cog_to_wavelength(packet["sensor_0" + str(j+1)]))
-            # ^ leaves data backwards for some reason, we have to flip it around to get something compatible
-            if str(cog_to_wavelength(packet["sensor_0" + str(j+1)])) == "1514.0" or str(cog_to_wavelength(packet["sensor_0" + str(j+1)])) == "1514":
-                data[i, j+8] = '0'
-            data[i, 8-j] = str(cog_to_wavelength(packet["sensor_0" + str(j+1)]))
-        except KeyError:
-            data[i, j+8] = '0'
-    i += 1
-
-# trim off the extra rows since we don't know how many there were going to be initially
-data = data[:i, :]
+# this is unofficially grabbed data, so it needs reshaping into something like the official data: one row per packet
+timestamps, wavelengths = pivot_capture(args.input[0], n_sensors=8)
+logger.info("Data loaded, found " + str(len(timestamps)) + " unique timestamps.")
+
+data = np.zeros((len(timestamps), 16))
+data[:, 0] = timestamps
+# sensors go in backwards (sensor 1 in column 8, sensor 8 in column 1) - otherwise the data comes out flipped
+data[:, 8:0:-1] = wavelengths
 
 logger.info("Saving data...")
 # add a header to the data, just like the official data
@@ -1,3 +1,12 @@
+import os
+import sys
+import inspect
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir)
+
+from common.lod import LODLine
 import argparse
 import numpy as np
 import matplotlib.pyplot as plt
@@ -43,6 +52,7 @@ data = np.genfromtxt(args.input[0], delimiter=';', skip_header=3)
 logger.info("Data loaded.")
 
 ffts = []
+lod_lines = [] # the raw data lines, decimated to the current view - they have to be kept around for their zoom callbacks
 above_average_times = []  # List to store the times when a value is above the average for each line
 
 if not args.no_fourier:
@@ -66,8 +76,8 @@ if not args.no_fourier:
         mplcursors.cursor(line)
 else:
     for i in range(8, 12):
-        line, = plt.plot(data[:, i], label='Sensor on r{}'.format(i))
-        mplcursors.cursor(line)
+        lod_lines.append(LODLine(plt.gca(), None, data[:, i], label='Sensor on r{}'.format(i)))
+        mplcursors.cursor(lod_lines[-1].line)
 if not args.no_fourier:
     plt.xlabel('Frequency')
     plt.ylabel('Amplitude')
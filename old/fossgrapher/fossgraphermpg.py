@@ -8,7 +8,8 @@ currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentfram
 parentdir = os.path.dirname(currentdir)
 sys.path.insert(0, parentdir)
 
-from common.cog import cog_to_wavelength
+from common.capture import pivot_capture
+from common.lod import LODLine
 import argparse
 import numpy as np
 import matplotlib.pyplot as plt
@@ -49,43 +50,17 @@ logger.info("Input file: " + args.input[0])
 logger.info("Output file: " + args.output[0])
 
 logger.info("Loading data...")
-# load with strings as well, since we need to parse the sensor numbers
-_data = np.genfromtxt(args.input[0], delimiter=',', skip_header=3, dtype=str)
-logger.info("Data loaded.")
+# this is unofficially grabbed data, so it needs reshaping into something like the official data: one row per packet
+timestamps, wavelengths = pivot_capture(args.input[0], n_sensors=8)
+logger.info("Data loaded, found " + str(len(timestamps)) + " unique timestamps.")
 
-# since this is unofficially grabbed data, we need to do some preprocessing to get it into a format similar to the official data
-data = np.zeros((_data.shape[0], 16))
-# find all unique timestamps in the data
-timestamps = np.unique(_data[:, 1])
-logger.info("Found " + str(len(timestamps)) + " unique timestamps.")
-new_packets = []
-# for each timestamp, find all rows that have that timestamp and put them in the right place in the new_packets array
-for timestamp in timestamps:
-    rows = np.where(_data[:, 1] == timestamp)[0]
-    new_packets.append({"timestamp": timestamp})
-    for row in rows:
-        if _data[row, 4] != 1:
-            new_packets[-1]["sensor_0" + str(int(_data[row, 2].split("_")[1]))] = _data[row, 3]
-
-# now we have a list of packets, each with a timestamp and 8 sensor values. we need to put them into the `data` array
-i = 0
-for packet in new_packets:
-    try:
-        data[i, 0] = packet["timestamp"]
-    except ValueError:
-        # missing timestamp, skip this packet
-        continue
-    for j in range(12):
-        try:
-            data[i, j+11] = str(cog_to_wavelength(packet["sensor_0" + str(j+1)]))
-        except KeyError:
-            data[i, j+11] = '0'
-    i += 1
-
-# trim off the extra rows since we don't know how many there were going to be initially
-data = data[:i, :]
+data = np.zeros((len(timestamps), 16))
+data[:, 0] = timestamps
+# sensors 1-5 in columns 11-15 (only 12-15 get plotted) - there's no room for the rest
+data[:, 11:16] = wavelengths[:, :5]
 
 ffts = []
+lod_lines = [] # the raw data lines, decimated to the current view - they have to be kept around for their zoom callbacks
 above_average_times = []  # List to store the times when a value is above the average for each line
 
 if not args.no_fourier:
@@ -109,8 +84,8 @@ if not args.no_fourier:
         mplcursors.cursor(line)
 else:
     for i in range(12, 16):
-        line, = plt.plot(data[:, i], label='Sensor on r{}'.format(i))
-        mplcursors.cursor(line)
+        lod_lines.append(LODLine(plt.gca(), None, data[:, i], label='Sensor on r{}'.format(i)))
+        mplcursors.cursor(lod_lines[-1].line)
 if not args.no_fourier:
     plt.xlabel('Frequency')
     plt.ylabel('Amplitude')
@@ -14,91 +14,22 @@ sys.path.insert(0, parentdir)
 
 from halo import Halo
 from common.formatmodule import bcolors, bsymbols, prints, files
-from common.fosmodule import datahelper, gatorpacket, packetsim
+from common.fosmodule import datahelper
 import pandas as pd
 import time
 import usb.core
 import usb.util
 import array
 import struct
-import threading
 from matplotlib import pyplot as plt
 from matplotlib.animation import FuncAnimation
 import matplotlib.animation as anim
 import numpy as np
 import argparse
 
-parser = argparse.ArgumentParser(description='Fetch data from the Gator hardware and save it to a CSV file.')
-parser.add_argument('output', help='The name of the CSV file to save the data to.')
-args = parser.parse_args()
-
-csvFile = None
-
-def cog_to_wavelength(binary):
-    return 1514+((int(binary, 2) * (1586-1514))/(2 ** 18)) # secret sauce
-
-def parserThread(rxBytes):
-    global csvFile
-
-    #Convert to bytearray
-    rxBuffer = array.array('B') #Unsigned char
-    rxBuffer.extend(rxBytes)
-    dataBytes = bytearray(rxBuffer)
-    dataBytes.reverse() #May need to reverse or rewrite the datahelper
-    #Init console status indicator
-    ### Instantiate classes ###
-    datum = datahelper()
-    #-------------------------#
-    #Set print option
-    save_to_csv = False
-    datum.raw_data = dataBytes
-    #----------------------------------------------------------------------------------------------#
-    ### Next, sort datum for packets ###
-    packets = datum.parse()
-    #----------------------------------------------------------------------------------------------#
-    try:
-        # kicked off every time data is recieved so the program can continue working even while data is being parsed
-        # prevents issues with sensor data not appearing correctly
-        data_frames = []
-        for key in packets:
-            thispacket = gatorpacket()
-            thispacket.raw_data = packets[key]
-            #This tuple contains the inner class objects of the packet class.
-            pkt_header, pkt_status, pkt_cog = thispacket.create_inner()
-            #Pull out relevant values
-            pkt_num = pkt_header.get_packet_num()
-            pkt_timestamp = pkt_header.get_timestamp()
-            #pkt_payload_len = pkt_header.get_payload_len()
-            #gator_version = pkt_header.get_version()
-            #gator_type = pkt_header.get_gator_type()
-            cog_data = pkt_cog.get_cog_data()
-            ### Get user decision on handling data ###
-            selection_csv = True
-            save_to_csv = True
-            #TODO: Save to CSV here!
-            #------------------------------------------------------------------------------------------------------------------------------------------#
-            if save_to_csv is True:
-                spinner.start()
-                cog = {}
-                err = {}
-                for key in cog_data.keys():
-                    cog[key] = cog_data[key]["cog"]
-                    err[key] = cog_data[key]["err"]
-                for key, value in cog_data.items():
-                    columns = {'packet':pkt_num,'timestamp':pkt_timestamp, 'sensor': key, 'cog': cog[key], 'err': err[key]}
-                    data_frames.append(columns)
-            #--------------------------------------------------------------------------------------------------------------------#
-        print("mpg-foss: Grabbed data frames!")
-        # we also want to add this data to the csv file
-        for frame in data_frames:
-            csvFile.write(f"{frame['packet']},{frame['timestamp']},{frame['sensor']},{frame['cog']},{frame['err']}\n")
-    except (KeyError, struct.error):
-        print(f"{bcolors.WARNING}mpg-foss: Error parsing data!{bcolors.ENDC}")
+from ingest import IngestPipeline, BufferRing, read_loop, csv_rows, CSV_HEADER
+from simgator import SimulatedGator
 
-# check if the output file exists. if it does, clear it.
-with open(args.output, "w") as f:
-    f.write("packet,timestamp,sensor,cog,err\n")
-csvFile = open(args.output, "a+") # we need to read and append
 spinner = Halo(spinner='dots')
 errorStatus = False
 date = time.strftime("%Y-%m-%d")
@@ -144,31 +75,45 @@ def main():
     #Globals
     global errorStatus
     global spinner
-    global collectDuration
-    global num_packets
-    global output_path
-    global csvFile
+
+    parser = argparse.ArgumentParser(description='Fetch data from the Gator hardware and save it to a CSV file.')
+    parser.add_argument('output', help='The name of the CSV file to save the data to.')
+    parser.add_argument('--workers', dest='workers', type=int, default=2, help='Number of threads decoding packets (default: 2)')
+    parser.add_argument('--queue', dest='queue_size', type=int, default=64, help='Reads that can wait for a decoder before new ones are dropped (default: 64)')
+    parser.add_argument('--read-size', dest='read_size', type=int, default=16384, help='Bytes to ask for in each USB transfer (default: 16384)')
+    parser.add_argument('--buffers', dest='buffers', type=int, default=None, help='Number of preallocated read buffers (default: enough for a full queue)')
+    parser.add_argument('--timeout', dest='timeout', type=int, default=1000, help='USB read timeout in ms (default: 1000)')
+    parser.add_argument('--simulate', dest='simulate', action='store_true', help='Read from a simulated Gator (packetsim) instead of the hardware')
+    args = parser.parse_args()
 
     #Initialize
     spinner.start()
-    threads = []
 
-    try:
-        gator_tuple = detect_gator()
-        dev = gator_tuple[0]
-        endpoint = gator_tuple[1]
-    except:
-        print("Failed to init gator.")
-        sys.exit(1)
+    if args.simulate:
+        dev, endpoint = SimulatedGator(rate=19320), SimulatedGator.endpoint
+    else:
+        try:
+            gator_tuple = detect_gator()
+            dev = gator_tuple[0]
+            endpoint = gator_tuple[1]
+        except:
+            print("Failed to init gator.")
+            sys.exit(1)
 
-    starterRxBytes = array.array('B', [0]) * (64 * 8)
+    # check if the output file exists. if it does, clear it.
+    csvFile = open(args.output, "w")
+    csvFile.write(CSV_HEADER)
+
+    # the Gator's packets arrive byte-reversed - the framer finds them in the raw stream and keeps partial packets
+    # between reads
+    datum = datahelper(reverse=True)
+    # decoded on a fixed pool of threads, written in the order the packets arrived
+    pipeline = IngestPipeline(csv_rows, csvFile.write, workers=args.workers, queue_size=args.queue_size).start()
+    # each read is framed into one of these, and it's only reused once that read's packets have been decoded
+    ring = BufferRing(args.buffers or args.queue_size + args.workers + 2, args.read_size)
 
     try:
-        while True:
-            rxBytes = starterRxBytes
-            dev.read(endpoint.bEndpointAddress, rxBytes)
-            threads.append(threading.Thread(target=parserThread, args=(rxBytes,)))
-            threads[-1].start()
+        read_loop(lambda rx: dev.read(endpoint.bEndpointAddress, rx, args.timeout), datum, pipeline, ring, args.read_size, endpoint.wMaxPacketSize)
 
     except(KeyboardInterrupt, SystemExit):
         print("mpg-foss: Process aborted.")
@@ -176,16 +121,14 @@ def main():
     except(struct.error, KeyError):
         print(f"{bcolors.WARNING}mpg-foss: Error parsing data!{bcolors.ENDC}")
 
-    spinner.start()
-    total = len(threads)
-    i = 0
-    for thread in threads:
-        spinner.text = f"mpg-foss: Cleaning up threads... {i}/{total}"
-        thread.join()
-        i += 1
-    spinner.succeed("mpg-foss: Threads cleaned up. Exiting...")
+    spinner.text = "mpg-foss: Writing out remaining data..."
+    pipeline.close()
+    csvFile.close()
+    print(f"mpg-foss: {datum.packets_found} packets, {datum.bad_packets} bad, {datum.missed} missed, {datum.sequence_errors} sequence errors, {datum.discarded} bytes discarded.")
+    print(f"mpg-foss: {pipeline.summary()}.")
+    spinner.succeed("mpg-foss: Done. Exiting...")
     return errorStatus
 
 #Run the main function if this module is called directly.
 if __name__ == '__main__':
-   main()
\ No newline at end of file
+   main()
@@ -15,6 +15,7 @@ sys.path.insert(0, parentdir)
 from halo import Halo
 from common.formatmodule import bcolors, bsymbols, prints, files
 from common.fosmodule import datahelper, gatorpacket, packetsim
+from common.cog import cog_to_wavelength
 import pandas as pd
 import time
 import usb.core
@@ -38,9 +39,6 @@ currentData = {
     "sensor8": 0,
 }
 
-def cog_to_wavelength(binary):
-    return 1514+((int(binary, 2) * (1586-1514))/(2 ** 18)) # secret sauce
-
 def plotDataFrame(frames):
     # set currentData
     global currentData
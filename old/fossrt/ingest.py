@@ -0,0 +1,214 @@
+"""
+Reader -> decoder -> writer pipeline for raw Gator data, used by fossfetch.py.
+
+The reader (whoever calls `submit`) hands over each read's packets, a fixed pool of decoder threads turns them into
+output (e.g. CSV rows) and a single writer thread writes the results in the order the reads were submitted - which is
+packet-sequence order, since the framer returns packets in the order they arrived.
+
+The queue in front of the decoders is bounded. If the decoders can't keep up, `submit` drops the read (counted in
+`dropped`) instead of blocking, so the USB reads keep draining the Gator - pass `drop_when_behind=False` to block instead,
+e.g. when the source can wait, like a file or the simulator. If a decoder takes so long that more than
+`reorder_window` later results are waiting on it, the writer moves on without it; its result is still written when it
+turns up, just out of order, and counted in `late`. Reads that fail to decode are counted in `errors` and skipped.
+
+`read_loop` is the reader: it reads the device in large transfers and has the framer copy each one into a buffer from a
+`BufferRing`, which goes back to the ring once the pipeline is done with that read's packets. The Gator's USB chip (an
+FTDI FT2232) starts every USB packet with two modem status bytes, which a raw pyusb read hands over along with the data,
+so those are stripped out of each read first (`strip_modem_status`).
+"""
+import os
+import sys
+import inspect
+import queue
+import threading
+import traceback
+import array
+import numpy as np
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir)
+
+from common.fosmodule import decode_packets, NUM_SENSORS, PACKET_LEN
+
+CSV_HEADER = "packet,timestamp,sensor,cog,err\n"
+SENSOR_NAMES = [f"sensor_{k + 1:02d}" for k in range(NUM_SENSORS)]
+HALF_BITS = [format(i, '09b') for i in range(512)] # the 18-bit CoG strings are built from two of these
+FTDI_STATUS_LEN = 2 # modem status bytes at the start of every USB packet from the FTDI chip
+
+def csv_rows(packets) -> str:
+    """fossfetch's CSV rows (one per sensor) for a read's packets - the same text as formatting each gatorpacket."""
+    decoded = decode_packets(packets)
+    cog = decoded['cog']
+    # plain Python lists from here on - per-element numpy access costs more than the formatting itself
+    high, low = (cog >> 9).tolist(), (cog & 0x1FF).tolist()
+    err = decoded['err'].tolist()
+    lines = []
+    for pkt_num, pkt_timestamp, high_bits, low_bits, err_bits in zip(decoded['packet_num'].tolist(), decoded['timestamp'].astype(float).tolist(), high, low, err):
+        for sensor, h, l, e in zip(SENSOR_NAMES, high_bits, low_bits, err_bits):
+            lines.append(f"{pkt_num},{pkt_timestamp},{sensor},{HALF_BITS[h]}{HALF_BITS[l]},{e}\n")
+    return "".join(lines)
+
+class BufferRing:
+    """
+    Preallocated buffers for the framer to copy reads into. `get` blocks until one is free, so size the ring to cover
+    every read that can be in the pipeline at once (queue size + workers + 2) and the reader never waits.
+    """
+    def __init__(self, count: int, read_size: int):
+        self.free = queue.Queue()
+        for _ in range(count):
+            # room for the read plus the partial packet carried over from the previous one
+            self.free.put(np.empty(read_size + PACKET_LEN, dtype=np.uint8))
+
+    def get(self) -> np.ndarray:
+        return self.free.get()
+
+    def put(self, buffer: np.ndarray):
+        self.free.put(buffer)
+
+def strip_modem_status(data, packet_size: int, out: np.ndarray) -> np.ndarray:
+    """
+    The data of one raw read without the FTDI status bytes at the start of each `packet_size`-byte USB packet (only the
+    last packet of a read can be shorter), copied into `out`. Returns the part of `out` that was filled.
+    """
+    raw = np.frombuffer(data, dtype=np.uint8)
+    full = len(raw) // packet_size
+    payload = packet_size - FTDI_STATUS_LEN
+    n = full * payload
+    out[:n].reshape(full, payload)[:] = raw[:full * packet_size].reshape(full, packet_size)[:, FTDI_STATUS_LEN:]
+    tail = raw[full * packet_size + FTDI_STATUS_LEN:]
+    out[n:n + len(tail)] = tail
+    return out[:n + len(tail)]
+
+def read_loop(read, framer, pipeline, ring: BufferRing, read_size: int, packet_size: int=None, should_stop=lambda: False) -> int:
+    """
+    Reads until `should_stop()` (or KeyboardInterrupt etc. from `read`). `read(buffer)` fills an array.array and returns
+    the number of bytes it read - dev.read does exactly that. `packet_size` is the endpoint's wMaxPacketSize, for
+    stripping the FTDI status bytes (None if the reads are just data). Returns the number of bytes read.
+    """
+    rx = array.array('B', bytes(read_size))
+    view = memoryview(rx)
+    data = np.empty(read_size, dtype=np.uint8)
+    total = 0
+    while not should_stop():
+        n = read(rx)
+        if not n:
+            continue
+        total += n
+        received = strip_modem_status(view[:n], packet_size, data) if packet_size else view[:n]
+        if not len(received):
+            continue # only status bytes - the latency timer ran out before any data arrived
+        buffer = ring.get()
+        packets = framer.feed(received, out=buffer)
+        if len(packets):
+            pipeline.submit(packets, release=lambda buffer=buffer: ring.put(buffer))
+        else:
+            ring.put(buffer)
+    return total
+
+class IngestPipeline:
+    def __init__(self, decode, write, workers: int=2, queue_size: int=32, reorder_window: int=None, drop_when_behind: bool=True):
+        """`decode(packets)` runs on the decoder threads and `write(result)` on the writer thread."""
+        self.decode = decode
+        self.write = write
+        self.workers = workers
+        # by default, enough for every other read in the pipeline to finish first - a decoder that merely lost the race
+        # for the GIL for a while isn't late
+        self.reorder_window = reorder_window if reorder_window is not None else queue_size + 2 * workers
+        self.drop_when_behind = drop_when_behind
+        self.jobs = queue.Queue(maxsize=queue_size)
+        self.results = queue.Queue()
+        self.threads = []
+        self.writer = None
+        self.submitted = 0
+        self.dropped = 0
+        self.late = 0
+        self.errors = 0
+        self.written = 0
+
+    def start(self) -> 'IngestPipeline':
+        self.threads = [threading.Thread(target=self.decoder_thread, daemon=True) for _ in range(self.workers)]
+        self.writer = threading.Thread(target=self.writer_thread, daemon=True)
+        for thread in self.threads + [self.writer]:
+            thread.start()
+        return self
+
+    def submit(self, packets, release=None) -> bool:
+        """
+        Queues one read's packets for decoding. Returns False (and counts it as dropped) if the queue is full.
+        `release()`, if given, is called once the packets aren't needed any more (decoded, or dropped).
+        """
+        try:
+            self.jobs.put((self.submitted, packets, release), block=not self.drop_when_behind)
+        except queue.Full:
+            self.dropped += 1
+            if release is not None:
+                release()
+            return False
+        self.submitted += 1
+        return True
+
+    def close(self):
+        """Decodes and writes everything already submitted, then stops the threads."""
+        for _ in self.threads:
+            self.jobs.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.results.put(None)
+        self.writer.join()
+
+    def summary(self) -> str:
+        return f"{self.submitted} reads queued, {self.written} written, {self.dropped} dropped, {self.late} late, {self.errors} failed"
+
+    def decoder_thread(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            seq, packets, release = job
+            try:
+                result = self.decode(packets)
+            except Exception:
+                traceback.print_exc()
+                self.errors += 1
+                result = None
+            if release is not None:
+                release()
+            # always report back, even on failure, so the writer never waits for a result that isn't coming
+            self.results.put((seq, result))
+
+    def writer_thread(self):
+        pending = {}
+        next_seq = 0
+        skipped = set()
+        while True:
+            item = self.results.get()
+            if item is None:
+                break
+            seq, result = item
+            if seq in skipped:
+                skipped.discard(seq)
+                self.late += 1
+                self._write(result)
+                continue
+            pending[seq] = result
+            if len(pending) > self.reorder_window and next_seq not in pending:
+                # give up on whatever is holding things up and carry on from the oldest result we have
+                oldest = min(pending)
+                skipped.update(range(next_seq, oldest))
+                next_seq = oldest
+            while next_seq in pending:
+                self._write(pending.pop(next_seq))
+                next_seq += 1
+        for seq in sorted(pending):
+            self._write(pending[seq])
+
+    def _write(self, result):
+        if result is None:
+            return
+        try:
+            self.write(result)
+            self.written += 1
+        except Exception:
+            traceback.print_exc()
+            self.errors += 1
@@ -0,0 +1,104 @@
+"""
+A stand-in for the Gator's USB device, built on packetsim, for running fossfetch and the ingest benchmark without hardware.
+"""
+import os
+import sys
+import inspect
+import time
+import numpy as np
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir)
+
+from common.fosmodule import packetsim, PACKET_LEN
+
+GATOR_RATE = 19320 # packets/sec
+
+def simulated_packets(n: int) -> bytearray:
+    # packetsim only generates 23 of the 24 CoG data bytes (42-byte packets) - pad each one out to the real length
+    raw = np.frombuffer(packetsim().generate_packets(n), dtype=np.uint8).reshape(n, PACKET_LEN - 1)
+    return bytearray(np.pad(raw, ((0, 0), (0, 1))).tobytes())
+
+class SimulatedGator:
+    """
+    Serves packets the way the Gator does - byte-reversed and back to back - through `read(endpoint, buffer, timeout)`,
+    which fills `buffer` (an array.array, like pyusb's dev.read) and returns the number of bytes read.
+
+    packetsim is far too slow to keep up with the real device, so `packets` of them are generated once and replayed over
+    and over with the packet numbers carried on. With `rate` (packets/sec) set, reads are paced like the real device:
+    a read returns once the buffer is full, or once `latency` seconds have passed (the FTDI chip's latency timer, 16 ms by
+    default) with whatever has arrived by then. Without it they are filled as fast as possible.
+
+    Like the FTDI chip, every `endpoint.wMaxPacketSize`-byte USB packet of a read starts with two modem status bytes
+    (`STATUS`), so the data in a read isn't contiguous and the reader has to strip them (see ingest.strip_modem_status).
+    """
+    class endpoint:
+        bEndpointAddress = 0x81
+        wMaxPacketSize = 512
+
+    STATUS = (0x31, 0x60) # what an idle FT2232 reports: modem status, line status
+
+    def __init__(self, packets: int=4096, rate: float=None, latency: float=0.016):
+        self.template = np.frombuffer(simulated_packets(packets), dtype=np.uint8).reshape(packets, PACKET_LEN)[:, ::-1].copy()
+        # packet number bytes (8 and 9 of a forward packet) and their values in the template
+        self._num_hi, self._num_lo = PACKET_LEN - 1 - 8, PACKET_LEN - 1 - 9
+        self._template_nums = (self.template[:, self._num_hi].astype(np.int64) << 8) | self.template[:, self._num_lo]
+        self.block = self.template.reshape(-1).copy()
+        self.rate = rate
+        self.latency = latency
+        self.position = 0
+        self.sent = 0
+        self.start = None
+        self._data = np.empty(0, dtype=np.uint8)
+
+    def _next_block(self):
+        nums = (self._template_nums + self.sent) % 65536
+        block = self.block.reshape(-1, PACKET_LEN)
+        block[:, self._num_hi] = nums >> 8
+        block[:, self._num_lo] = nums & 0xFF
+        self.position = 0
+
+    def read(self, endpoint, buffer, timeout=None) -> int:
+        packet_size = self.endpoint.wMaxPacketSize
+        payload = packet_size - len(self.STATUS)
+        # the data bytes that fit in the buffer around the status bytes
+        full, rest = divmod(len(buffer), packet_size)
+        size = full * payload + max(rest - len(self.STATUS), 0)
+        if self.rate is not None:
+            now = time.perf_counter()
+            if self.start is None:
+                self.start = now
+            deadline = now + self.latency
+            # wait for the buffer to fill or the latency timer to run out, then hand over whatever has arrived
+            while True:
+                now = time.perf_counter()
+                due = int((now - self.start) * self.rate * PACKET_LEN) - self.sent * PACKET_LEN - self.position
+                if due >= size or (now >= deadline and due > 0):
+                    break
+                time.sleep(max(min(deadline, now + (size - due) / (self.rate * PACKET_LEN)) - now, 0.0005))
+            size = min(size, due)
+        if len(self._data) < size:
+            self._data = np.empty(size, dtype=np.uint8)
+        data = self._data
+        n = 0
+        while n < size:
+            if self.position == len(self.block):
+                self.sent += len(self.template)
+                self._next_block()
+            k = min(size - n, len(self.block) - self.position)
+            data[n:n + k] = self.block[self.position:self.position + k]
+            self.position += k
+            n += k
+        # split the data into USB packets, each with the status bytes in front
+        out = np.frombuffer(buffer, dtype=np.uint8)
+        full, rest = divmod(size, payload)
+        packets = out[:full * packet_size].reshape(full, packet_size)
+        packets[:, :len(self.STATUS)] = self.STATUS
+        packets[:, len(self.STATUS):] = data[:full * payload].reshape(full, payload)
+        end = full * packet_size
+        if rest:
+            out[end:end + len(self.STATUS)] = self.STATUS
+            out[end + len(self.STATUS):end + len(self.STATUS) + rest] = data[full * payload:size]
+            end += len(self.STATUS) + rest
+        return end
@@ -0,0 +1,80 @@
+"""
+Checks the batch packet decoder (fosmodule.decode_packets) against the per-packet gatorpacket decoder and benchmarks both.
+
+Decodes packets from packetsim plus packets of random bytes (so every CoG, error and status bit gets exercised), compares
+every header field, the status word, CoG value and error bit with gatorpacket, then times both decoders in packets per
+second.
+Run with `python test-decode.py [packets]` from the fossrt directory.
+"""
+import os
+import sys
+import inspect
+import time
+import struct
+import numpy as np
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir)
+
+from common.fosmodule import gatorpacket, decode_packets, cog_strings, PACKET_LEN
+from simgator import simulated_packets
+
+def random_packets(n: int) -> bytearray:
+    rng = np.random.default_rng(0)
+    raw = rng.integers(0, 256, size=(n, PACKET_LEN), dtype=np.uint8)
+    raw[:, 12:16] = np.frombuffer(b'ohoy', dtype=np.uint8)
+    return bytearray(raw.tobytes())
+
+def reference(data: bytearray) -> list:
+    decoded = []
+    for start in range(0, len(data), PACKET_LEN):
+        packet = gatorpacket()
+        packet.raw_data = data[start:start + PACKET_LEN]
+        header, status, cog = packet.create_inner()
+        decoded.append((header.get_payload_len(), header.get_timestamp(), header.get_packet_num(), header.get_gator_type(), header.get_version(), status_word(packet, header, status), cog.get_cog_data()))
+    return decoded
+
+def status_word(packet: gatorpacket, header, status) -> int:
+    # status.get_num_found() can't be used: it unpacks 3 bytes with '>c', which always raises, and reads from byte 17 -
+    # so take the status instance's bytes from gatorpacket's layout (right after the header) and unpack them big-endian
+    start = header.len
+    result, = struct.unpack('>I', b'\x00' + bytes(packet.raw_data[start:start + status.len]))
+    return result
+
+def check(data: bytearray) -> int:
+    batch = decode_packets(data)
+    strings = cog_strings(batch['cog'])
+    mismatches = 0
+    for i, (payload_len, timestamp, packet_num, gator_type, version, status, sensors) in enumerate(reference(data)):
+        fields = (batch['payload_len'][i], batch['timestamp'][i], batch['packet_num'][i], batch['gator_type'][i], batch['version'][i], batch['status'][i])
+        # compare timestamps as their raw bits so NaNs from random bytes compare equal too
+        same = fields[0] == payload_len and struct.pack('>f', fields[1]) == struct.pack('>f', timestamp) and fields[2:] == (packet_num, gator_type, version, status)
+        for k, key in enumerate(sorted(sensors)):
+            same = same and sensors[key]['cog'] == strings[i, k] and int(sensors[key]['err']) == batch['err'][i, k]
+        mismatches += not (same and batch['sync_ok'][i])
+    return mismatches
+
+def packets_per_second(decode, data: bytearray, n: int) -> float:
+    start = time.perf_counter()
+    decode(data)
+    return n / (time.perf_counter() - start)
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    simulated = simulated_packets(n)
+    rand = random_packets(n)
+
+    for name, data in (("packetsim", simulated), ("random", rand)):
+        mismatches = check(data)
+        print(f"{name}: {n} packets, {mismatches} mismatches")
+        if mismatches:
+            sys.exit(1)
+
+    old = packets_per_second(reference, rand, n)
+    new = packets_per_second(decode_packets, rand, n)
+    print(f"gatorpacket:    {old:12,.0f} packets/s")
+    print(f"decode_packets: {new:12,.0f} packets/s ({new / old:.0f}x)")
+
+if __name__ == '__main__':
+    main()
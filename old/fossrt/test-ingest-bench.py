@@ -0,0 +1,66 @@
+"""
+Benchmarks fossfetch's ingest path (read loop -> framer -> decoder pool -> writer) against a simulated Gator.
+
+For each transfer size, reads a fixed number of packets from SimulatedGator as fast as the rest of the pipeline can take
+them (the reader waits for the decoders instead of dropping reads), then reports the packets/s achieved, the number of
+reads, and the late/failed counters. It does this twice: once only decoding the packets, and once producing fossfetch's
+CSV rows (written to a throwaway file). It also checks that every packet arrived and that the rows were written in packet
+order. The simulator puts the FTDI chip's status bytes at the start of every 512-byte USB packet like the real device, so
+this also checks that they're stripped before framing. The real Gator sends 19320 packets/s.
+Run with `python test-ingest-bench.py [packets] [workers]` from the fossrt directory.
+"""
+import sys
+import time
+import tempfile
+import numpy as np
+
+from simgator import SimulatedGator, GATOR_RATE
+from ingest import IngestPipeline, BufferRing, read_loop, csv_rows
+from common.fosmodule import datahelper, decode_packets
+
+READ_SIZES = [512, 4096, 16384, 65536]
+QUEUE_SIZE = 64
+
+def run(n_packets: int, read_size: int, workers: int, decode, write) -> dict:
+    dev = SimulatedGator()
+    framer = datahelper(reverse=True)
+    pipeline = IngestPipeline(decode, write, workers=workers, queue_size=QUEUE_SIZE, drop_when_behind=False).start()
+    ring = BufferRing(QUEUE_SIZE + workers + 2, read_size)
+    reads = 0
+    def read(rx):
+        nonlocal reads
+        reads += 1
+        return dev.read(dev.endpoint.bEndpointAddress, rx)
+    start = time.perf_counter()
+    read_loop(read, framer, pipeline, ring, read_size, dev.endpoint.wMaxPacketSize, should_stop=lambda: framer.packets_found >= n_packets)
+    pipeline.close()
+    elapsed = time.perf_counter() - start
+    return {"packets": framer.packets_found, "rate": framer.packets_found / elapsed, "reads": reads, "pipeline": pipeline, "framer": framer}
+
+def main():
+    n_packets = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    print(f"{n_packets} packets per run, {workers} decoder threads, Gator rate {GATOR_RATE} packets/s")
+
+    for label in ("decode only", "decode + CSV rows"):
+        print(f"\n{label}:")
+        for read_size in READ_SIZES:
+            packet_nums = []
+            if label == "decode only":
+                result = run(n_packets, read_size, workers, lambda packets: decode_packets(packets)['packet_num'], packet_nums.append)
+                nums = np.concatenate(packet_nums).astype(np.int64)
+            else:
+                with tempfile.TemporaryFile("w+") as f:
+                    result = run(n_packets, read_size, workers, csv_rows, f.write)
+                    f.seek(0)
+                    f.readline()
+                    nums = np.array([int(line.split(",", 1)[0]) for line in f][::8], dtype=np.int64)
+            pipeline, framer = result["pipeline"], result["framer"]
+            in_order = np.all(np.diff(nums) % 65536 == 1)
+            complete = len(nums) == result["packets"] and framer.missed == 0 and framer.bad_packets == 0
+            print(f"  {read_size:6d} B reads: {result['rate']:12,.0f} packets/s ({result['rate'] / GATOR_RATE:6.1f}x real time), "
+                  f"{result['reads']} reads, {pipeline.late} late, {pipeline.errors} failed, "
+                  f"{'complete' if complete else 'INCOMPLETE'}, {'in order' if in_order else 'OUT OF ORDER'}")
+
+if __name__ == '__main__':
+    main()
@@ -1,26 +1,101 @@
 import argparse
 from betterlib.logging import Logger
 import os
-from tqdm import tqdm
+import time
 import json
-import sys
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from tqdm import tqdm
+from preprocess import preprocess, write_json
+from processed import write_processed, JSON_NAME, NPY_NAME
 
-logger = Logger("./nmpg-pre-bulk.log", "NMPG Preprocessor (Bulk Mode)")
+SUMMARY_NAME = "bulk_summary.json"
 
 debug = True
 
+def newest_input(drain: str) -> float:
+    """Modification time of the newest input file of a drain (the microstrain files and weight_data.csv)."""
+    microstrain_path = os.path.join(drain, "microstrain")
+    inputs = [os.path.join(microstrain_path, file) for file in os.listdir(microstrain_path)]
+    inputs.append(os.path.join(drain, "weight_data.csv"))
+    return max(os.path.getmtime(path) for path in inputs)
+
+def up_to_date(drain: str, output_name: str) -> bool:
+    output_path = os.path.join(drain, output_name)
+    try:
+        return os.path.getmtime(output_path) > newest_input(drain)
+    except OSError: # no output yet, or missing inputs (which processing will report properly)
+        return False
+
+def process_drain(drain: str, output_format: str, indent: bool, frf: bool, match_method: str) -> dict:
+    """Preprocesses one drain in a worker process. Never raises - failures are reported in the result."""
+    start = time.perf_counter()
+    try:
+        # the pool already keeps every core busy, so read each drain's files one at a time
+        frfs = preprocess(drain, frf=frf, match_method=match_method, workers=1)
+        if output_format == 'npy':
+            write_processed(frfs, os.path.join(drain, NPY_NAME))
+        else:
+            write_json(frfs, os.path.join(drain, JSON_NAME), indent=indent)
+        return {"status": "processed", "intervals": len(frfs), "seconds": round(time.perf_counter() - start, 2)}
+    except Exception as e:
+        return {"status": "failed", "error": f"{type(e).__name__}: {e}", "traceback": traceback.format_exc(), "seconds": round(time.perf_counter() - start, 2)}
+
+def main():
+    logger = Logger("./nmpg-pre-bulk.log", "NMPG Preprocessor (Bulk Mode)")
+
+    parser = argparse.ArgumentParser(description='Data pre-processing script for NMPG/MPG-FOSS')
+    parser.add_argument('data', metavar='data', type=str, help='Path to data (standard format: microstrain dir and weight_data.csv)')
+    parser.add_argument('--format', dest='format', choices=['npy', 'json'], default='npy', help='Output format (default: npy) - npy is a compact, memory-mappable array (see processed.py), json is the old processed_drain.json')
+    parser.add_argument('--indent', dest='indent', action='store_true', help='Export JSON with indentation')
+    parser.add_argument('--no-frf', dest='frf', action='store_false', help='Disable FRF calculation for noise reduction (default: enabled)')
+    parser.add_argument('--match-method', dest='match_method', type=str, default='fixed', help='Method for matching timestamps (default: fixed) - options: fixed, timestamp-smart')
+    parser.add_argument('--workers', dest='workers', type=int, default=os.cpu_count(), help='Number of drains to process at once (default: number of CPU cores)')
+    parser.add_argument('--force', dest='force', action='store_true', help='Reprocess drains even if their output is newer than their data')
+    args = parser.parse_args()
+    logger.debug("parsed args")
+
+    dirs = sorted(name for name in os.listdir(args.data) if os.path.isdir(os.path.join(args.data, name)))
+    summary = {}
+    todo = []
+    for name in dirs:
+        if not args.force and up_to_date(os.path.join(args.data, name), NPY_NAME if args.format == 'npy' else JSON_NAME):
+            summary[name] = {"status": "skipped"}
+        else:
+            todo.append(name)
+    logger.info(f"{len(dirs)} drains found, {len(todo)} to process ({len(dirs) - len(todo)} already up to date).")
 
-parser = argparse.ArgumentParser(description='Data pre-processing script for NMPG/MPG-FOSS')
-parser.add_argument('data', metavar='data', type=str, help='Path to data (standard format: microstrain dir and weight_data.csv)')
-parser.add_argument('--indent', dest='indent', action='store_true', help='Export JSON with indentation')
-args = parser.parse_args()
-logger.debug("parsed args")
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = {pool.submit(process_drain, os.path.join(args.data, name), args.format, args.indent, args.frf, args.match_method): name for name in todo}
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Preprocessing data...", unit="drain"):
+            name = futures[future]
+            result = future.result()
+            summary[name] = result
+            if result["status"] == "failed":
+                logger.error(f"Failed to preprocess drain {name}: {result['error']}")
+            else:
+                logger.info(f"Preprocessed drain {name} ({result['intervals']} intervals, {result['seconds']}s)")
+    elapsed = time.perf_counter() - start
 
-dirs = os.listdir(args.data)
-dirs.sort()
+    failed = [name for name in dirs if summary[name]["status"] == "failed"]
+    summary_path = os.path.join(args.data, SUMMARY_NAME)
+    with open(summary_path, "w") as f:
+        json.dump({
+            "workers": args.workers,
+            "seconds": round(elapsed, 2),
+            "processed": sum(1 for result in summary.values() if result["status"] == "processed"),
+            "skipped": sum(1 for result in summary.values() if result["status"] == "skipped"),
+            "failed": failed,
+            "drains": {name: summary[name] for name in dirs},
+        }, f, indent=4)
+    logger.info(f"Summary written to {summary_path}")
 
-for i in tqdm(range(len(dirs)), desc="Preprocessing data...", unit="drain"):
-    os.system("python3 nmpg-pre/nmpg-pre.py \"" + os.path.join(args.data, dirs[i]) + "\" --no-interact " + ("--indent" if args.indent else ""))
-    logger.info("Preprocessed drain " + str(i+1) + "/" + str(len(dirs)) + " (" + dirs[i] + ")")
+    if failed:
+        logger.error(f"Preprocessing finished with {len(failed)} failed drain(s): {', '.join(failed)}")
+        return 1
+    logger.info("Preprocessing complete.")
+    return 0
 
-logger.info("Preprocessing complete.")
\ No newline at end of file
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,231 @@
+"""
+Array-based preprocessing engine for NMPG/MPG-FOSS drains, used by nmpg-pre.py.
+
+Produces exactly the same processed_drain.json as the original row-by-row script, quirks and all, but works on whole
+columns instead of Python rows:
+- microstrain files are read one at a time (in parallel) straight into float arrays, without writing a joined temp file,
+- timestamps are parsed with vectorized datetime64 conversion (falling back to dateutil for anything that isn't plain ISO),
+- samples and weight readings are matched to intervals through integer keys, searchsorted and bincount instead of
+  string scans.
+
+The original matched rows to an interval by checking whether str(parse(timestamp))[0:-5] ends with the interval's
+"HH:MM:SS.d" - i.e. by the time of day truncated to a tenth of a second, ignoring the date. `timestamp_keys` turns each
+timestamp into that same key as an integer (tenths of a second since midnight), and NO_MATCH for timestamps whose string
+form could never match (no fractional seconds, time zones, parse errors).
+"""
+import os
+import re
+import json
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from dateutil.parser import parse
+
+FIXED_INTERVAL = 19320 # samples/sec
+TIMESTEP = 0.2 # seconds
+TIMESTAMP_THRESHOLD = 16000 # non-matching rows before timestamp-smart matching gives up on an interval
+NO_MATCH = -1
+ISO_TIMESTAMP = r'\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}(\.\d{1,6})?'
+INTERVAL_KEY = re.compile(r'(\d{2}):(\d{2}):(\d{2})\.(\d)')
+
+def convert_to_timestamp(timestamp_str):
+    try:
+        parsed_timestamp = parse(timestamp_str)
+        return str(parsed_timestamp)
+    except ValueError as e:
+        print(f"Error parsing timestamp: <{e}>")
+        return None
+
+def key_from_string(key: str) -> int:
+    """Integer key for the last 10 characters of a truncated timestamp string, if they look like "HH:MM:SS.d"."""
+    match = INTERVAL_KEY.fullmatch(key[-10:]) if key is not None else None
+    if match is None:
+        return NO_MATCH
+    h, m, s, d = map(int, match.groups())
+    return ((h * 60 + m) * 60 + s) * 10 + d
+
+def timestamp_keys(timestamps: pd.Series) -> np.ndarray:
+    """Interval key of every raw timestamp string (see the module docstring)."""
+    timestamps = timestamps.astype(str).str.strip()
+    if len(timestamps) and timestamps.str.fullmatch(ISO_TIMESTAMP).all():
+        us = np.array(timestamps.to_numpy(), dtype='datetime64[us]').astype(np.int64)
+        keys = (us % (86400 * 10**6)) // 100000
+        # str(datetime) leaves out the fractional part when it's exactly zero, so those never matched anything
+        keys[us % 10**6 == 0] = NO_MATCH
+        return keys
+    # anything else goes through dateutil, like the original - but only once per distinct string
+    unique, inverse = np.unique(timestamps.to_numpy(), return_inverse=True)
+    keys = np.array([key_from_string(None if ts is None else ts[0:-5]) for ts in map(convert_to_timestamp, unique)], dtype=np.int64)
+    return keys[inverse]
+
+def read_microstrain_file(path: str, first: bool) -> tuple:
+    # the original concatenated lines[3:] of every file under a 3-line header and read that with skiprows=3, so the
+    # first line after the header of the *first* file ended up as the column names
+    df = pd.read_csv(path, delimiter=';', skiprows=3, header=0 if first else None)
+    return df.iloc[:, 0], df.iloc[:, -8:].to_numpy(dtype=np.float64)
+
+def load_microstrain(microstrain_path: str, workers: int=None) -> tuple:
+    """
+    Reads every file in the microstrain directory (in name order) and returns
+    (first raw timestamp, last raw timestamp, interval key per row, (rows, 8) wavelength/microstrain array, is_microstrain).
+    Files are parsed in parallel, and each one is reduced to keys and floats as soon as it's read.
+    """
+    files = sorted(os.listdir(microstrain_path))
+    is_microstrain = not any("wavelength" in file.lower() for file in files)
+    def read(args):
+        i, file = args
+        timestamps, sensors = read_microstrain_file(os.path.join(microstrain_path, file), i == 0)
+        return timestamps.iloc[0], timestamps.iloc[-1], timestamp_keys(timestamps), sensors
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        parts = [part for part in pool.map(read, enumerate(files)) if len(part[2])]
+    keys = np.concatenate([part[2] for part in parts])
+    sensors = np.concatenate([part[3] for part in parts])
+    return parts[0][0], parts[-1][1], keys, sensors, is_microstrain
+
+def to_microstrain(sensors: np.ndarray) -> np.ndarray:
+    """Converts the first 7 wavelength tracks to microstrain in place (the 8th is left alone, like the original)."""
+    for i in range(0, 7):
+        track = sensors[:, i]
+        sensors[:, i] = ((track - track[0]) / track[0]) * (1 / (1 - 0.22)) * 10**6
+    return sensors
+
+def load_weight(weight_path: str) -> tuple:
+    weight = pd.read_csv(weight_path, delimiter=',', header=None, skiprows=1)
+    return weight.iloc[:, 0].to_numpy(dtype=np.float64), timestamp_keys(weight.iloc[:, 1])
+
+def make_intervals(first_timestamp: str, last_timestamp: str) -> tuple:
+    first, last = convert_to_timestamp(first_timestamp), convert_to_timestamp(last_timestamp)
+    intervals = np.arange(parse(str(first)), parse(str(last)), pd.Timedelta("0.2s"))
+    intervals = [str(i)[:-5] for i in intervals]
+    return intervals, np.array([key_from_string(interval) for interval in intervals], dtype=np.int64)
+
+class KeyIndex:
+    """Row positions grouped by key, so all rows with a given key at or after some position can be found with searchsorted."""
+    def __init__(self, keys: np.ndarray):
+        self.order = np.argsort(keys, kind='stable')
+        self.sorted_keys = keys[self.order]
+
+    def positions(self, key: int) -> np.ndarray:
+        lo, hi = np.searchsorted(self.sorted_keys, [key, key + 1])
+        return self.order[lo:hi]
+
+def weight_averages(interval_keys: np.ndarray, weight_keys: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """
+    Average weight for every interval, as the original computed it: the mean of every weight row from the last matched
+    row onwards whose key matches the interval (0.0 if there are none).
+    """
+    index = KeyIndex(weight_keys)
+    # the common case - every row with the key is at or after the last match - is a plain grouped sum; bincount adds
+    # the rows in order starting from 0.0, which gives bit-for-bit the same sums as the original loop
+    valid = weight_keys >= 0
+    n_keys = int(max(weight_keys.max(initial=0), interval_keys.max(initial=0))) + 1
+    sums = np.bincount(weight_keys[valid], weights=weights[valid], minlength=n_keys)
+    counts = np.bincount(weight_keys[valid], minlength=n_keys)
+    averages = np.zeros(len(interval_keys))
+    weight_startrow = 0
+    for k, key in enumerate(interval_keys):
+        if key == NO_MATCH:
+            continue
+        positions = index.positions(key)
+        first = np.searchsorted(positions, weight_startrow)
+        if first == len(positions):
+            continue
+        if first == 0:
+            averages[k] = sums[key] / counts[key]
+        else:
+            matched = positions[first:]
+            averages[k] = np.cumsum(weights[matched])[-1] / len(matched)
+        weight_startrow = positions[-1]
+    return averages
+
+def fixed_rows(n_rows: int, n_intervals: int):
+    """Row ranges for the "fixed" match method: consecutive blocks of 0.2 s worth of samples, whatever the timestamps say."""
+    step = int(FIXED_INTERVAL * TIMESTEP)
+    for k in range(n_intervals):
+        yield k, slice(min(k * step, n_rows), min((k + 1) * step, n_rows))
+
+def timestamp_smart_rows(interval_keys: np.ndarray, keys: np.ndarray):
+    """
+    Rows for the "timestamp-smart" match method: from the last matched row on, every row whose key matches the interval,
+    until more than TIMESTAMP_THRESHOLD rows haven't matched.
+    """
+    index = KeyIndex(keys)
+    startrow = 0
+    for k, key in enumerate(interval_keys):
+        positions = index.positions(key) if key != NO_MATCH else np.zeros(0, dtype=np.int64)
+        positions = positions[np.searchsorted(positions, startrow):]
+        # rows skipped before each match - non-decreasing, so the cut-off is a searchsorted too
+        skipped = positions - startrow - np.arange(len(positions))
+        positions = positions[:np.searchsorted(skipped, TIMESTAMP_THRESHOLD, side='right')]
+        if len(positions):
+            startrow = positions[-1]
+        yield k, positions
+
+def spectra(sensors: np.ndarray, rows, fbg1: int, fbg2: int, frf: bool=True):
+    """FRF (or plain FFT) of each interval's rows, in the same order as `rows`. Equal-length blocks are transformed together."""
+    x, y = sensors[:, fbg1 - 1], sensors[:, fbg2 - 1]
+    def one(selection):
+        frf_x, frf_y = x[selection], y[selection]
+        try:
+            if frf:
+                return np.fft.fft(frf_x) / np.fft.fft(frf_y)
+            return np.fft.fft(frf_x)
+        except ValueError:
+            return np.array([0.0])
+    rows = list(rows)
+    full = [(k, s) for k, s in rows if isinstance(s, slice) and s.stop - s.start == int(FIXED_INTERVAL * TIMESTEP)]
+    results = {}
+    if full:
+        # fixed blocks are contiguous and the same length - batch them into one 2-D FFT, which gives the same numbers
+        idx = np.array([s.start for _, s in full])[:, None] + np.arange(int(FIXED_INTERVAL * TIMESTEP))
+        X = np.fft.fft(x[idx], axis=1)
+        batch = X / np.fft.fft(y[idx], axis=1) if frf else X
+        for (k, _), result in zip(full, batch):
+            results[k] = result
+    for k, selection in rows:
+        if k not in results:
+            results[k] = one(selection)
+    return results
+
+def preprocess(data_path: str, fbg1: int=7, fbg2: int=2, frf: bool=True, match_method: str="fixed", workers: int=None, logger=None) -> list:
+    """
+    Runs the whole pipeline for one drain directory and returns the processed rows ([interval, spectrum, weight average]),
+    with each spectrum as a float64 array - see `write_json` and `processed.write_processed` for saving them.
+    """
+    info = logger.info if logger else (lambda msg: None)
+    if not (1 <= fbg1 <= 8 and 1 <= fbg2 <= 8):
+        raise ValueError("FBG numbers must be between 1 and 8")
+    info("Loading microstrain data...")
+    first_timestamp, last_timestamp, keys, sensors, is_microstrain = load_microstrain(os.path.join(data_path, "microstrain"), workers)
+    info("Loading weight data...")
+    weights, weight_keys = load_weight(os.path.join(data_path, "weight_data.csv"))
+    if not is_microstrain:
+        info("Converting wavelength data to µstrain...")
+        to_microstrain(sensors)
+    info("Finding 0.2s intervals for FRFs...")
+    intervals, interval_keys = make_intervals(first_timestamp, last_timestamp)
+    averages = weight_averages(interval_keys, weight_keys, weights)
+    if match_method == "timestamp-smart":
+        rows = timestamp_smart_rows(interval_keys, keys)
+    elif match_method == "fixed":
+        rows = fixed_rows(len(sensors), len(intervals))
+    else:
+        raise ValueError(f"Unknown match method: {match_method}")
+    info("Calculating FRFs...")
+    # intervals without a weight are pruned from the output, so don't bother transforming them
+    results = spectra(sensors, ((k, s) for k, s in rows if averages[k] != 0), fbg1, fbg2, frf)
+    return [[intervals[k], results[k].real, float(averages[k])] for k in sorted(results)]
+
+def write_json(frfs: list, output_path: str, indent: bool=False):
+    """Writes the processed rows in the original processed_drain.json layout."""
+    with open(output_path, "w") as f:
+        if indent:
+            json.dump([[interval, spectrum.tolist(), weight] for interval, spectrum, weight in frfs], f, indent=4)
+            return
+        # same text as json.dump(frfs, f), but each row goes through the C encoder instead of the pure-Python streaming one
+        f.write("[")
+        for i, (interval, spectrum, weight) in enumerate(frfs):
+            if i:
+                f.write(", ")
+            f.write(json.dumps([interval, spectrum.tolist(), weight]))
+        f.write("]")
@@ -0,0 +1,81 @@
+"""
+Compact binary format for processed NMPG drains (processed_drain.npy), with loaders for surfplot and training code.
+
+Each drain is a single structured .npy array with one record per 0.2 s interval:
+- timestamp: start of the interval (datetime64[ms], same instant as the interval string in processed_drain.json),
+- weight: average tank weight over the interval,
+- length: number of points in the interval's spectrum,
+- frf: the first length // 2 + 1 points of the spectrum as float32, zero-padded to the longest one.
+
+The spectra are the real part of FFTs (or FFT ratios) of real signals, so the second half is the mirror image of the first
+and doesn't need storing - `full_spectrum` puts it back. Load with `load_processed`, which memory-maps the file, so even a
+big drain costs nothing until rows are actually read.
+"""
+import os
+import numpy as np
+
+JSON_NAME = "processed_drain.json"
+NPY_NAME = "processed_drain.npy"
+
+def processed_dtype(bins: int) -> np.dtype:
+    return np.dtype([('timestamp', '<M8[ms]'), ('weight', '<f8'), ('length', '<i4'), ('frf', '<f4', (bins,))])
+
+def to_records(frfs: list) -> np.ndarray:
+    """Converts rows from `preprocess.preprocess` ([interval, spectrum, weight]) into a structured array."""
+    lengths = np.array([len(spectrum) for _, spectrum, _ in frfs], dtype=np.int32)
+    data = np.zeros(len(frfs), dtype=processed_dtype(int(lengths.max(initial=0)) // 2 + 1))
+    data['timestamp'] = np.array([interval for interval, _, _ in frfs], dtype='datetime64[ms]')
+    data['weight'] = [weight for _, _, weight in frfs]
+    data['length'] = lengths
+    for record, (_, spectrum, _) in zip(data, frfs):
+        half = spectrum[:len(spectrum) // 2 + 1]
+        record['frf'][:len(half)] = half
+    return data
+
+def write_processed(frfs: list, output_path: str):
+    np.save(output_path, to_records(frfs))
+
+def load_processed(path: str, mmap: bool=True) -> np.ndarray:
+    """Loads processed_drain.npy (or a drain directory containing one), memory-mapped unless `mmap` is False."""
+    if os.path.isdir(path):
+        path = os.path.join(path, NPY_NAME)
+    return np.load(path, mmap_mode='r' if mmap else None)
+
+def interval_names(data: np.ndarray) -> list:
+    """The interval strings processed_drain.json used ("YYYY-MM-DDTHH:MM:SS.d")."""
+    return [name[:-2] for name in np.datetime_as_string(data['timestamp'], unit='ms')]
+
+def full_spectrum(record) -> np.ndarray:
+    """Rebuilds a whole spectrum (as in processed_drain.json) from one record."""
+    length = int(record['length'])
+    half = np.asarray(record['frf'][:length // 2 + 1], dtype=np.float64)
+    return np.concatenate([half, half[1:(length + 1) // 2][::-1]])
+
+def surfplot_matrix(data: np.ndarray) -> np.ndarray:
+    """
+    What surfplot shows: the first half (int(length / 2) points) of every spectrum, zero-padded to the longest one,
+    as an (intervals, points) float32 array.
+    """
+    halves = data['length'] // 2
+    width = int(halves.max(initial=0))
+    matrix = np.array(data['frf'][:, :width])
+    matrix[np.arange(width) >= halves[:, None]] = 0
+    return matrix
+
+def training_arrays(paths, bins: int=None) -> tuple:
+    """
+    Features and targets for training across drains: X is an (intervals, bins) float32 array of half-spectra and y the
+    matching weights. `paths` are drain directories or .npy files. Intervals shorter than the usual window (the partial last
+    one of each drain) are left out so every row of X means the same thing; `bins` defaults to the width of the first drain.
+    """
+    X, y = [], []
+    for path in paths:
+        data = load_processed(path)
+        full = data[data['length'] == data['length'].max(initial=0)]
+        if bins is None:
+            bins = full.dtype['frf'].shape[0]
+        X.append(np.asarray(full['frf'][:, :bins], dtype=np.float32))
+        y.append(np.asarray(full['weight']))
+    if not X:
+        return np.zeros((0, bins or 0), dtype=np.float32), np.zeros(0)
+    return np.concatenate(X), np.concatenate(y)
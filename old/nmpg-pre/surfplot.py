@@ -5,40 +5,48 @@ import os
 import json
 import mplcursors
 import argparse
+from processed import load_processed, surfplot_matrix, interval_names, JSON_NAME, NPY_NAME
 
 logger = Logger("./nmpg-surfplot.log", "NMPG Data Surfplot")
 
 parser = argparse.ArgumentParser(description='Data surfplot script for NMPG/MPG-FOSS')
-parser.add_argument('data', metavar='data', type=str, help='Path to data (should already be processed, containing processed_drain.json)')
+parser.add_argument('data', metavar='data', type=str, help='Path to data (should already be processed, containing processed_drain.npy or processed_drain.json)')
 args = parser.parse_args()
 
 logger.info("Loading data...")
-path = os.path.join(args.data, "processed_drain.json")
-with open(path, "r") as f:
-    data = json.load(f)
-logger.info("Data loaded.")
-
-logger.info("Zero-padding data...")
-_data = data
-for row in _data:
-    # chop off the last 50% of each row's 2nd column
-    row[1] = row[1][:int(len(row[1])/2)]
-largest = 0
-for row in _data:
-    if len(row[1]) > largest:
-        largest = len(row[1])
-for row in _data:
-    while len(row[1]) < largest:
-        row[1].append(0)
-data = _data
-logger.info("Data zero-padded.")
-
-logger.info("Double-checking data...")
-first = len(data[0][1])
-for row in data:
-    if len(row[1]) != first:
-        logger.critical("Somehow, the data is not the same length. This is a bug.")
-        exit(1)
+if os.path.exists(os.path.join(args.data, NPY_NAME)):
+    processed = load_processed(args.data)
+    # first half of every spectrum, zero-padded to the longest one
+    frfs = surfplot_matrix(processed)
+    data = [[name, frf, weight] for name, frf, weight in zip(interval_names(processed), frfs, processed['weight'].tolist())]
+    logger.info("Data loaded.")
+else:
+    path = os.path.join(args.data, JSON_NAME)
+    with open(path, "r") as f:
+        data = json.load(f)
+    logger.info("Data loaded.")
+
+    logger.info("Zero-padding data...")
+    _data = data
+    for row in _data:
+        # chop off the last 50% of each row's 2nd column
+        row[1] = row[1][:int(len(row[1])/2)]
+    largest = 0
+    for row in _data:
+        if len(row[1]) > largest:
+            largest = len(row[1])
+    for row in _data:
+        while len(row[1]) < largest:
+            row[1].append(0)
+    data = _data
+    logger.info("Data zero-padded.")
+
+    logger.info("Double-checking data...")
+    first = len(data[0][1])
+    for row in data:
+        if len(row[1]) != first:
+            logger.critical("Somehow, the data is not the same length. This is a bug.")
+            exit(1)
 
 logger.info("Plotting...")
 # plot one slice of the data to see what it looks like